@@ -7,3 +7,102 @@ REQUIRED_COLUMNS = [
     'merch_lat', 'merch_long', 'is_weekend', 'is_night', 'card_holder_age'
 ]
 TARGET_COLUMN = 'is_fraud'
+
+# Режим предобработки: 'standard' (исходный) или 'fast' (векторный, компактные типы)
+PREPROCESSING_MODE = os.getenv("PREPROCESSING_MODE", "standard")
+
+# Кэш загруженных моделей
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "8"))
+MODEL_CACHE_MAX_BYTES = int(os.getenv("MODEL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+MODEL_PRELOAD = [name.strip() for name in os.getenv("MODEL_PRELOAD", "").split(",") if name.strip()]
+
+# Загрузка файлов
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+
+# Потоковые предсказания
+PREDICT_CHUNK_SIZE = int(os.getenv("PREDICT_CHUNK_SIZE", "100000"))
+
+# Фоновые задачи обучения
+TRAINING_MAX_CONCURRENT_JOBS = int(os.getenv("TRAINING_MAX_CONCURRENT_JOBS", "1"))
+TRAINING_MAX_QUEUED_JOBS = int(os.getenv("TRAINING_MAX_QUEUED_JOBS", "16"))
+TRAINING_JOB_HISTORY = int(os.getenv("TRAINING_JOB_HISTORY", "100"))
+
+# Пулы выполнения для /predict и /eda: 'thread' или 'process'
+PREDICT_EXECUTOR = os.getenv("PREDICT_EXECUTOR", "thread")
+PREDICT_WORKERS = int(os.getenv("PREDICT_WORKERS", str(os.cpu_count() or 1)))
+PREDICT_MAX_QUEUE = int(os.getenv("PREDICT_MAX_QUEUE", "64"))
+EDA_EXECUTOR = os.getenv("EDA_EXECUTOR", "process")
+EDA_WORKERS = int(os.getenv("EDA_WORKERS", str(os.cpu_count() or 1)))
+EDA_MAX_QUEUE = int(os.getenv("EDA_MAX_QUEUE", "16"))
+
+# Кривая обучения: 'full', 'approximate', 'deferred' или 'off'
+LEARNING_CURVE_MODE = os.getenv("LEARNING_CURVE_MODE", "full")
+LEARNING_CURVE_N_JOBS = int(os.getenv("LEARNING_CURVE_N_JOBS", "1"))
+LEARNING_CURVE_APPROX_CV = int(os.getenv("LEARNING_CURVE_APPROX_CV", "3"))
+LEARNING_CURVE_APPROX_SIZES = int(os.getenv("LEARNING_CURVE_APPROX_SIZES", "5"))
+LEARNING_CURVE_MAX_SAMPLES = int(os.getenv("LEARNING_CURVE_MAX_SAMPLES", "50000"))
+# Интервал повторного запроса (Retry-After, с), пока отложенная кривая обучения строится
+LEARNING_CURVE_RETRY_AFTER = int(os.getenv("LEARNING_CURVE_RETRY_AFTER", "5"))
+
+# EDA
+EDA_HISTOGRAM_BINS = int(os.getenv("EDA_HISTOGRAM_BINS", "30"))
+# Столбец для графика распределения; если его нет в данных, берётся первый числовой столбец,
+# не являющийся индексом или идентификатором
+EDA_DISTRIBUTION_COLUMN = os.getenv("EDA_DISTRIBUTION_COLUMN", "amt")
+
+# Кэш предобработанных признаков для повторного обучения; по умолчанию - рядом с моделями
+# в MODEL_DIR (каталог данных, доступный для записи), путь из окружения используется как есть
+FEATURE_CACHE_ENABLED = os.getenv("FEATURE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+FEATURE_CACHE_DIR = os.getenv("FEATURE_CACHE_DIR", os.path.join(MODEL_DIR, "feature_cache"))
+FEATURE_CACHE_MAX_BYTES = int(os.getenv("FEATURE_CACHE_MAX_BYTES", str(5 * 1024 * 1024 * 1024)))
+
+# Перебор гиперпараметров
+SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", str(os.cpu_count() or 1)))
+
+# Формат загрузки моделей для предсказаний: 'compact' (.npz без pickle, если есть) или 'pickle'
+MODEL_FORMAT = os.getenv("MODEL_FORMAT", "compact")
+
+# JSON-предсказания по отдельным транзакциям с динамическим объединением в пакеты
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "256"))
+MICROBATCH_MAX_WAIT_US = int(os.getenv("MICROBATCH_MAX_WAIT_US", "500"))
+PREDICT_JSON_MAX_ROWS = int(os.getenv("PREDICT_JSON_MAX_ROWS", "1000"))
+
+# Заголовок Server-Timing с длительностями этапов во всех ответах; без него заголовок
+# добавляется только по запросу (X-Server-Timing: 1 или параметр server_timing=1)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+
+# Потоковое обучение (partial_fit) для данных, не помещающихся в память
+TRAINING_CHUNK_SIZE = int(os.getenv("TRAINING_CHUNK_SIZE", "100000"))
+TRAINING_STREAM_EPOCHS = int(os.getenv("TRAINING_STREAM_EPOCHS", "3"))
+
+# Общее для всех процессов хранилище моделей в MODEL_DIR (файлы .shared, отображаемые в память):
+# словари кодирования размещаются в нём всегда, модели - только загружаемые из pickle
+# (MODEL_FORMAT=pickle или модели без компактного файла .npz)
+MODEL_SHARED_STORE = os.getenv("MODEL_SHARED_STORE", "true").lower() in ("1", "true", "yes")
+
+# Оценка моделей: доли транзакций, на которые поднимается тревога (precision при бюджете),
+# и число интервалов оценок для потокового подсчёта ROC-AUC/PR-AUC
+EVALUATION_ALERT_BUDGETS = [
+    float(value) for value in os.getenv("EVALUATION_ALERT_BUDGETS", "0.001,0.005,0.01").split(",") if value.strip()
+]
+EVALUATION_SCORE_BINS = int(os.getenv("EVALUATION_SCORE_BINS", "10000"))
+# Пробное предсказание на моделях из MODEL_PRELOAD при старте (прогрев кода предобработки и модели)
+MODEL_PREWARM = os.getenv("MODEL_PREWARM", "true").lower() in ("1", "true", "yes")
+
+# Предсказание несколькими моделями по одному файлу (основная модель и претенденты):
+# модели выполняются в пуле потоков, если строк не меньше PREDICT_COMPARE_PARALLEL_MIN_ROWS
+PREDICT_COMPARE_MAX_MODELS = int(os.getenv("PREDICT_COMPARE_MAX_MODELS", "8"))
+PREDICT_COMPARE_WORKERS = int(os.getenv("PREDICT_COMPARE_WORKERS", str(os.cpu_count() or 1)))
+PREDICT_COMPARE_PARALLEL_MIN_ROWS = int(os.getenv("PREDICT_COMPARE_PARALLEL_MIN_ROWS", "50000"))
+
+# Потоковый EDA для больших файлов: чтение блоками, однопроходные статистики и случайная выборка
+# строк для графиков. Включается параметром streaming или автоматически для файлов от EDA_STREAMING_MIN_BYTES
+EDA_STREAMING_MIN_BYTES = int(os.getenv("EDA_STREAMING_MIN_BYTES", str(512 * 1024 * 1024)))
+EDA_CHUNK_SIZE = int(os.getenv("EDA_CHUNK_SIZE", "100000"))
+EDA_SAMPLE_SIZE = int(os.getenv("EDA_SAMPLE_SIZE", "100000"))
+EDA_SKETCH_ACCURACY = float(os.getenv("EDA_SKETCH_ACCURACY", "0.01"))
+
+# Журнал WAL для реестра моделей (registry.db): ускоряет одновременные чтение и запись,
+# но требует общей памяти между процессами, поэтому включается только для локального диска
+REGISTRY_WAL = os.getenv("REGISTRY_WAL", "false").lower() in ("1", "true", "yes")
@@ -1,21 +1,39 @@
-import base64
-import io
+import asyncio
 import json
 import os
+from functools import partial
+from email.utils import formatdate, parsedate_to_datetime
 
-import pandas as pd
-from PIL import Image
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form
-from pydantic import BaseModel
-from fastapi.responses import JSONResponse
-from backend.config import MODEL_DIR
-from backend.services.eda_service import get_plots
-from backend.services.training_service import train_model
-from backend.services.prediction_service import predict, get_model_info
-from backend.managers.model_manager import list_available_models
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
+from pydantic import BaseModel, field_validator
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, Response
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from backend.config import (
+    MODEL_PRELOAD, MODEL_PREWARM, SERVER_TIMING, TRAINING_STREAM_EPOCHS, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_US,
+    PREDICT_JSON_MAX_ROWS, PREDICT_COMPARE_MAX_MODELS, LEARNING_CURVE_RETRY_AFTER
+)
+from backend.services.eda_service import get_plots, get_summary
+from backend.managers.data_loader import spool_upload, detect_format, check_upload_size
+from backend.managers.executors import predict_executor, eda_executor
+from backend.managers.batching import MicroBatcher
+from backend.services.job_service import training_jobs, JobQueueFullError
+from backend.services.training_service import (
+    train_model_from_file, train_model_streaming, sweep_from_file, sweep_metric_names
+)
+from backend.services.prediction_service import (
+    predict_file, predict_file_models, predict_records, predict_stream, get_model_info, get_learning_curve,
+    learning_curve_pending, shutdown_learning_curves,
+    preload_models, warm_models, get_cache_stats, STREAM_MEDIA_TYPES, RESPONSE_MEDIA_TYPES, PREDICTION_FIELDS
+)
+from backend.managers.model_manager import list_available_models, search_models, _validate_model_name
+from backend.managers.evaluation import metric_names
+from backend.services.monitoring_service import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, get_metrics
 
 import warnings
 import logging
+from datetime import date, datetime, timezone
+from typing import List, Optional, Union
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -23,6 +41,7 @@ logging.basicConfig(level=logging.INFO)
 
 warnings.filterwarnings('ignore')
 app = FastAPI()
+app.add_middleware(MetricsMiddleware, server_timing=SERVER_TIMING)
 
 LOCAL_FILE_PATH = "data/credit_card_transactions.csv"  # Локальный путь к файлам
 
@@ -32,116 +51,582 @@ class ModelParams(BaseModel):
     C: float = 1.0
 
 
+class StreamingParams(ModelParams):
+    epochs: int = TRAINING_STREAM_EPOCHS
+
+
+class SweepParams(BaseModel):
+    max_iter: List[int]
+    C: List[float]
+    top_k: int = 1
+    metric: str = "f1_test"
+
+
+class Transaction(BaseModel):
+    trans_date_trans_time: datetime
+    category: str
+    amt: float
+    gender: str
+    state: str
+    lat: float
+    long: float
+    city_pop: int
+    dob: date
+    merch_lat: float
+    merch_long: float
+    trans_num: Optional[str] = None
+
+    @field_validator("trans_date_trans_time")
+    @classmethod
+    def to_naive_utc(cls, value: datetime) -> datetime:
+        """
+        Приводит время с часовым поясом к UTC без пояса: транзакции разных запросов
+        объединяются в один DataFrame, где смешение наивного и aware времени - ошибка
+        """
+        if value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+class TransactionsRequest(BaseModel):
+    model_name: str
+    transactions: Union[Transaction, List[Transaction]]
+
+
+# Поля сортировки /models помимо метрик моделей
+MODEL_SORT_KEYS = ("created_at", "name")
+
+
+# Одновременные JSON-запросы к одной модели объединяются в один вызов predict_records
+transactions_batcher = MicroBatcher(
+    "predict_json", predict_records, predict_executor, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_US
+)
+
+
+async def run_on_upload(executor, fn, file: UploadFile, *args):
+    """
+    Выполняет fn(*args, source, content_type) в пуле исполнителей.
+
+    В пул потоков передаётся сам объект загруженного файла, в пул процессов -
+    путь к временной копии файла на диске, которая удаляется после выполнения.
+    """
+    if executor.kind == "thread" and check_upload_size(file):
+        return await executor.run(fn, *args, file.file, file.content_type)
+
+    # Копирование файла на диск выполняется в пуле потоков, чтобы не блокировать цикл событий
+    path = await run_in_threadpool(spool_upload, file)
+    try:
+        return await executor.run(fn, *args, path, file.content_type)
+    finally:
+        os.unlink(path)
+
+
+@app.on_event("startup")
+async def preload_configured_models():
+    """
+    Предзагрузка моделей из MODEL_PRELOAD в кэш при старте приложения
+    (и пробное предсказание на них, если включён MODEL_PREWARM).
+    """
+    if MODEL_PRELOAD and MODEL_PREWARM:
+        warm_models(MODEL_PRELOAD)
+    elif MODEL_PRELOAD:
+        preload_models(MODEL_PRELOAD)
+
+
+@app.on_event("shutdown")
+async def stop_training_jobs():
+    """
+    Остановка пула фоновых задач обучения при завершении приложения.
+    """
+    training_jobs.shutdown()
+
+
+@app.on_event("shutdown")
+async def stop_executors():
+    """
+    Завершение пулов исполнителей /predict и /eda с ожиданием текущих задач,
+    пакетов /predict/transactions и очереди отложенных кривых обучения.
+    """
+    await transactions_batcher.shutdown()
+    predict_executor.shutdown()
+    eda_executor.shutdown()
+    shutdown_learning_curves()
+
+
+async def resolve_training_source(file: UploadFile, file_path: str, use_local_file: bool):
+    """
+    Определяет источник данных для обучения.
+
+    Возвращает кортеж (путь, формат данных, функция очистки); загруженный файл
+    копируется во временный файл (в пуле потоков, не блокируя цикл событий),
+    который удаляет функция очистки.
+    """
+    if use_local_file:
+        if not os.path.exists(LOCAL_FILE_PATH):
+            logger.error("Локальный файл не найден")
+            raise HTTPException(status_code=404, detail="Локальный файл не найден")
+        return LOCAL_FILE_PATH, None, None
+    if file:
+        source = await run_in_threadpool(spool_upload, file)
+        return source, detect_format(source, file.content_type), lambda: os.unlink(source)
+    if file_path:
+        if not os.path.exists(file_path):
+            logger.error(f"Файл не найден: {file_path}")
+            raise HTTPException(status_code=404, detail="Файл не найден")
+        return file_path, None, None
+    logger.error("Не передан файл для обучения")
+    raise HTTPException(status_code=400, detail="Не передан файл")
+
+
+def submit_training_job(task, params: BaseModel, cleanup) -> dict:
+    """
+    Ставит задачу обучения в очередь; при переполнении очереди возвращает 503.
+    """
+    try:
+        job = training_jobs.submit(task, params, cleanup)
+    except JobQueueFullError as e:
+        if cleanup is not None:
+            cleanup()
+        raise HTTPException(status_code=503, detail=str(e))
+    logger.info(f"Задача обучения {job['job_id']} создана")
+    return job
+
+
+def parse_list(value: str, cast) -> list:
+    """
+    Разбирает список значений, разделённых запятыми.
+    """
+    try:
+        return [cast(item) for item in value.split(",") if item.strip()]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Некорректный список значений '{value}': {e}")
+
+
 @app.post("/train")
 async def train_and_save_model(
     file: UploadFile = File(None),
     file_path: str = Form(None),
     use_local_file: bool = Form(False),
     max_iter: int = Form(1000),
-    C: float = Form(1.0)
+    C: float = Form(1.0),
+    wait: bool = Form(False),
+    streaming: bool = Form(False),
+    epochs: int = Form(TRAINING_STREAM_EPOCHS)
 ):
     """
     Обучение модели на предоставленных данных и сохранение результатов.
+
+    Обучение выполняется фоновой задачей: ответ содержит job_id, состояние задачи
+    доступно через /jobs/{job_id}. При wait=True ответ возвращается после окончания
+    обучения и содержит имя модели и её метрики.
+    При streaming=True файл обрабатывается блоками и модель (SGDClassifier) обучается
+    за epochs проходов partial_fit, поэтому данные могут не помещаться в память;
+    max_iter в этом режиме не используется, кривая обучения не строится.
     """
-    model_params = ModelParams(max_iter=max_iter, C=C)
+    model_params = StreamingParams(max_iter=max_iter, C=C, epochs=epochs) if streaming else ModelParams(
+        max_iter=max_iter, C=C
+    )
     try:
-        if use_local_file:
-            if os.path.exists(LOCAL_FILE_PATH):
-                df = pd.read_csv(LOCAL_FILE_PATH)
-                logger.info(f"Данные загружены из локального файла: {LOCAL_FILE_PATH}")
-            else:
-                logger.error("Локальный файл не найден")
-                raise HTTPException(status_code=404, detail="Локальный файл не найден")
-        elif file:
-            df = pd.read_csv(io.StringIO(str(file.file.read(), 'utf-8')))
-            logger.info("Данные успешно загружены из загруженного файла")
-        elif file_path:
-            if os.path.exists(file_path):
-                df = pd.read_csv(file_path)
-                logger.info(f"Данные успешно загружены из пути: {file_path}")
-            else:
-                logger.error(f"Файл не найден: {file_path}")
-                raise HTTPException(status_code=404, detail="Файл не найден")
-        else:
-            logger.error("Не передан файл для обучения")
-            raise HTTPException(status_code=400, detail="Не передан файл")
-
-        model_name = train_model(df, model_params)
+        source, data_format, cleanup = await resolve_training_source(file, file_path, use_local_file)
+
+        def task(on_stage):
+            if streaming:
+                return train_model_streaming(
+                    source, model_params, data_format=data_format, epochs=epochs, on_stage=on_stage
+                )
+            return train_model_from_file(source, model_params, data_format=data_format, on_stage=on_stage)
+
+        job = submit_training_job(task, model_params, cleanup)
+        if not wait:
+            return JSONResponse(status_code=202, content=job)
+
+        model_name = await asyncio.wrap_future(training_jobs.get_future(job["job_id"]))
         logger.info(f"Модель {model_name} успешно обучена и сохранена")
-        model_info = get_model_info(model_name)
+        model_info = await run_in_threadpool(get_model_info, model_name)
 
-        return {"message": f"Модель {model_name} успешно обучена и сохранена.", "model_name": model_name, **model_info}
+        return {
+            "message": f"Модель {model_name} успешно обучена и сохранена.",
+            "model_name": model_name,
+            "job_id": job["job_id"],
+            **model_info
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при обучении модели: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка при обучении модели: {e}")
 
 
+@app.post("/train/sweep")
+async def sweep_hyperparameters(
+    file: UploadFile = File(None),
+    file_path: str = Form(None),
+    use_local_file: bool = Form(False),
+    max_iter: str = Form("1000"),
+    C: str = Form("0.01,0.1,1.0,10.0"),
+    top_k: int = Form(1),
+    metric: str = Form("f1_test"),
+    wait: bool = Form(False)
+):
+    """
+    Перебор гиперпараметров: данные предобрабатываются и разбиваются один раз,
+    кандидаты обучаются параллельно, сохраняются только top_k лучших по metric.
+
+    max_iter, C: списки значений через запятую, перебираются все сочетания.
+    Результат (ранжированный список кандидатов) доступен в поле result задачи
+    /jobs/{job_id} или сразу в ответе при wait=True.
+    """
+    sweep_params = SweepParams(
+        max_iter=parse_list(max_iter, int), C=parse_list(C, float), top_k=top_k, metric=metric
+    )
+    if not sweep_params.max_iter or not sweep_params.C or sweep_params.top_k < 1:
+        raise HTTPException(status_code=400, detail="Нужны непустые списки max_iter и C и top_k >= 1")
+    if sweep_params.metric not in sweep_metric_names():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестная метрика для ранжирования: {sweep_params.metric}; "
+                   f"допустимые: {', '.join(sweep_metric_names())}"
+        )
+    try:
+        source, data_format, cleanup = await resolve_training_source(file, file_path, use_local_file)
+        grid = {"max_iter": sweep_params.max_iter, "C": sweep_params.C}
+
+        def task(on_stage):
+            return sweep_from_file(source, grid, top_k, metric, data_format=data_format, on_stage=on_stage)
+
+        job = submit_training_job(task, sweep_params, cleanup)
+        if not wait:
+            return JSONResponse(status_code=202, content=job)
+
+        result = await asyncio.wrap_future(training_jobs.get_future(job["job_id"]))
+        logger.info(f"Перебор завершён, лучшая модель {result['model_name']}")
+        return {"job_id": job["job_id"], **result}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при переборе гиперпараметров: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при переборе гиперпараметров: {e}")
+
+
+@app.get("/jobs")
+async def get_training_jobs():
+    """
+    Получение списка задач обучения.
+    """
+    return training_jobs.list()
+
+
+@app.get("/jobs/{job_id}")
+async def get_training_job(job_id: str):
+    """
+    Получение состояния задачи обучения: статус, этапы и имя обученной модели.
+    """
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Задача {job_id} не найдена")
+    return job
+
+
 @app.post("/predict")
 async def make_prediction(
     model_name: str = Form(...),
-    file: UploadFile = File(...)
+    file: UploadFile = File(...),
+    stream: bool = Form(False),
+    output_format: Optional[str] = Form(None),
+    fields: str = Form("all"),
+    id_column: Optional[str] = Form(None)
 ):
     """
     Выполнение предсказаний на основе загруженной модели.
+
+    output_format: 'json' (по умолчанию, список объектов), 'columns' (объект
+    {столбец: список значений}), 'csv' или 'arrow' (Arrow IPC stream).
+    fields: 'all' - все признаки и предсказание, 'predictions' - только предсказание.
+    id_column: столбец входного файла (например, trans_num), копируемый в ответ
+    для сопоставления строк (строки, отброшенные как выбросы, в ответ не попадают).
+    При stream=True файл обрабатывается блоками, а результат отдаётся потоком
+    в формате NDJSON (по умолчанию) или CSV.
     """
+    _validate_model_name(model_name)
+    media_types = STREAM_MEDIA_TYPES if stream else RESPONSE_MEDIA_TYPES
+    output_format = output_format or ("ndjson" if stream else "json")
+    if output_format not in media_types:
+        raise HTTPException(status_code=400, detail=f"Неподдерживаемый формат ответа: {output_format}")
+    if fields not in PREDICTION_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Неподдерживаемый состав ответа: {fields}")
     try:
-        df = pd.read_csv(io.StringIO(str(file.file.read(), 'utf-8')))
-        logger.info(f"Данные для предсказания успешно загружены для модели {model_name}")
-        predictions = predict(model_name, df)
+        if stream:
+            path = await run_in_threadpool(spool_upload, file)
+            try:
+                # Определение формата и загрузка модели (чтение pickle или .npz) выполняются
+                # в пуле потоков; в цикле событий остаётся только отправка блоков ответа
+                chunks = await run_in_threadpool(
+                    lambda: predict_stream(
+                        model_name, path, output_format, data_format=detect_format(path, file.content_type),
+                        fields=fields, id_column=id_column
+                    )
+                )
+            except BaseException:
+                os.unlink(path)
+                raise
+            logger.info(f"Запущено потоковое предсказание для модели {model_name}")
+            return StreamingResponse(
+                chunks,
+                media_type=STREAM_MEDIA_TYPES[output_format],
+                background=BackgroundTask(os.unlink, path),
+            )
+
+        body = await run_on_upload(
+            predict_executor,
+            partial(predict_file, output_format=output_format, fields=fields, id_column=id_column),
+            file,
+            model_name,
+        )
         logger.info(f"Предсказания успешно выполнены для модели {model_name}")
-        return predictions
+        return Response(content=body, media_type=RESPONSE_MEDIA_TYPES[output_format])
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при выполнении предсказания для модели {model_name}: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка при выполнении предсказания: {e}")
 
 
+@app.post("/predict/compare")
+async def compare_models(
+    model_names: str = Form(...),
+    file: UploadFile = File(...),
+    output_format: str = Form("json"),
+    fields: str = Form("predictions"),
+    id_column: Optional[str] = Form(None)
+):
+    """
+    Предсказание несколькими моделями по одному файлу (основная модель и претенденты).
+
+    model_names: имена моделей через запятую; первая - основная.
+    Файл читается и предобрабатывается один раз, в ответе по столбцу prediction_<модель>
+    на каждую модель и статистика согласия претендентов с основной моделью (для csv
+    и arrow - в заголовке X-Agreement-Statistics). Остальные параметры - как у /predict.
+    """
+    names = parse_list(model_names, str.strip)
+    if not names or len(names) > PREDICT_COMPARE_MAX_MODELS or len(set(names)) != len(names):
+        raise HTTPException(
+            status_code=400, detail=f"Нужно от 1 до {PREDICT_COMPARE_MAX_MODELS} различных имён моделей"
+        )
+    for name in names:
+        _validate_model_name(name)
+    if output_format not in RESPONSE_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Неподдерживаемый формат ответа: {output_format}")
+    if fields not in PREDICTION_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Неподдерживаемый состав ответа: {fields}")
+    try:
+        body, statistics = await run_on_upload(
+            predict_executor,
+            partial(predict_file_models, output_format=output_format, fields=fields, id_column=id_column),
+            file,
+            names,
+        )
+        logger.info(f"Предсказания успешно выполнены для моделей {', '.join(names)}")
+        headers = None
+        if RESPONSE_MEDIA_TYPES[output_format] != "application/json":
+            headers = {"X-Agreement-Statistics": json.dumps(statistics)}
+        return Response(content=body, media_type=RESPONSE_MEDIA_TYPES[output_format], headers=headers)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении предсказания для моделей {', '.join(names)}: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при выполнении предсказания: {e}")
+
+
+@app.post("/predict/transactions")
+async def predict_transactions(request: TransactionsRequest):
+    """
+    Предсказание для одной транзакции или небольшого массива транзакций в формате JSON.
+
+    Одновременные запросы к одной модели объединяются в пакеты (не более
+    MICROBATCH_MAX_SIZE транзакций, ожидание не дольше MICROBATCH_MAX_WAIT_US мкс).
+    Для транзакций, отброшенных предобработкой как выбросы, prediction равен null.
+    """
+    _validate_model_name(request.model_name)
+    transactions = request.transactions if isinstance(request.transactions, list) else [request.transactions]
+    if len(transactions) > PREDICT_JSON_MAX_ROWS:
+        raise HTTPException(
+            status_code=413, detail=f"Слишком много транзакций в запросе (не более {PREDICT_JSON_MAX_ROWS})"
+        )
+    try:
+        records = [transaction.model_dump() for transaction in transactions]
+        predictions = await transactions_batcher.submit(request.model_name, records)
+        return {
+            "model_name": request.model_name,
+            "predictions": [
+                {"trans_num": record["trans_num"], "prediction": prediction}
+                for record, prediction in zip(records, predictions)
+            ],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении предсказания для модели {request.model_name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при выполнении предсказания: {e}")
+
+
 @app.get("/model_info/{model_name}")
-async def get_model_details(model_name: str):
+async def get_model_details(model_name: str, inline_image: bool = False):
     """
     Получение информации о модели, включая метрики и кривую обучения.
+
+    Кривая обучения возвращается ссылкой learning_curve_url; при inline_image=True
+    дополнительно передаётся изображение в формате base64.
     """
+    _validate_model_name(model_name)
     try:
-        model_info = get_model_info(model_name)
-        learning_curve_path = os.path.join(MODEL_DIR, model_name, "learning_curve.png")
-
-        if os.path.exists(learning_curve_path):
-            with open(learning_curve_path, "rb") as img_file:
-                img_data = img_file.read()
-                img_base64 = base64.b64encode(img_data).decode('utf-8')
-            model_info["learning_curve"] = img_base64
-            logger.info(f"Кривая обучения успешно загружена для модели {model_name}")
-        else:
-            logger.warning(f"Кривая обучения не найдена для модели {model_name}")
-
-        return model_info
+        return await run_in_threadpool(get_model_info, model_name, inline_image=inline_image)
     except Exception as e:
         logger.error(f"Ошибка при получении информации о модели {model_name}: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка при получении информации о модели: {e}")
 
 
+@app.get("/models/{model_name}/learning_curve.png")
+async def get_learning_curve_image(model_name: str, request: Request, v: str = None):
+    """
+    Получение изображения кривой обучения с поддержкой условных запросов.
+
+    Ответ содержит ETag и Last-Modified; при совпадении If-None-Match или
+    If-Modified-Since возвращается 304. Если в URL передана актуальная версия (v),
+    изображение кэшируется клиентом без повторных проверок. Пока отложенная кривая
+    строится, возвращается 202 с заголовком Retry-After.
+    """
+    _validate_model_name(model_name)
+    try:
+        learning_curve = await run_in_threadpool(get_learning_curve, model_name)
+    except Exception as e:
+        logger.error(f"Ошибка при получении кривой обучения модели {model_name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при получении кривой обучения: {e}")
+    if learning_curve is None:
+        if learning_curve_pending(model_name):
+            return JSONResponse(
+                status_code=202,
+                content={"detail": "Кривая обучения строится, повторите запрос позже"},
+                headers={"Retry-After": str(LEARNING_CURVE_RETRY_AFTER)},
+            )
+        raise HTTPException(status_code=404, detail="Кривая обучения не найдена")
+
+    learning_curve_path, version = learning_curve
+    etag = f'"{version}"'
+    last_modified_ts = int(os.path.getmtime(learning_curve_path))
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified_ts, usegmt=True),
+        "Cache-Control": "public, max-age=31536000, immutable" if v == version else "public, no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        not_modified = etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    elif if_modified_since is not None:
+        try:
+            not_modified = last_modified_ts <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            not_modified = False
+    else:
+        not_modified = False
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(learning_curve_path, media_type="image/png", headers=headers)
+
+
 @app.get("/models")
-async def get_available_models():
+async def get_available_models(
+    limit: int = None,
+    offset: int = 0,
+    sort_by: str = "created_at",
+    order: str = "desc",
+    name_prefix: str = None,
+    created_after: str = None,
+    created_before: str = None,
+    min_value: float = None,
+    details: bool = False,
+    include_total: bool = False
+):
     """
-    Получение списка доступных моделей.
+    Получение списка доступных моделей из реестра.
+
+    Поддерживает постраничный вывод (limit, offset), сортировку по дате создания,
+    имени или метрике (sort_by=f1_test, order=asc|desc) и отбор по префиксу имени,
+    дате создания и минимальному значению метрики sort_by.
+    При details=True возвращает записи реестра с параметрами, метриками и размерами;
+    общее количество записей (total) подсчитывается только при include_total=True.
     """
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order должен быть asc или desc")
+    if sort_by not in MODEL_SORT_KEYS and sort_by not in metric_names():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестное поле сортировки: {sort_by}; допустимые: "
+                   f"{', '.join(MODEL_SORT_KEYS + tuple(metric_names()))}"
+        )
+    query = dict(
+        limit=limit, offset=offset, sort_by=sort_by, descending=order == "desc", name_prefix=name_prefix,
+        created_after=created_after, created_before=created_before, min_value=min_value,
+        include_total=include_total and details
+    )
     try:
-        models = list_available_models()
+        models = search_models(**query) if details else list_available_models(**query)
         logger.info("Список доступных моделей успешно получен")
         return models
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при получении списка моделей: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка при получении списка моделей: {e}")
 
 
+@app.get("/models/cache")
+async def get_model_cache_stats():
+    """
+    Получение состояния кэша моделей (содержимое, попадания и промахи).
+    """
+    return get_cache_stats()
+
+
+@app.get("/metrics")
+async def get_service_metrics():
+    """
+    Метрики сервиса в формате Prometheus: длительность запросов и этапов обработки,
+    количество обработанных строк, объём принятых данных, состояние кэша моделей и пулов.
+    """
+    return Response(content=get_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @app.post("/eda")
-async def perform_eda(file: UploadFile = File(...)):
+async def perform_eda(
+    file: UploadFile = File(...),
+    output: str = Form("json"),
+    streaming: Optional[bool] = Form(None)
+):
     """
     Выполнение анализа данных (EDA) на основе загруженного файла.
+
+    output='json' возвращает гистограммы, статистики, пропуски и матрицу корреляции
+    для построения графиков на клиенте; output='png' - готовые графики в base64.
+    streaming=True читает файл блоками с ограниченной памятью (квантили и гистограммы
+    приближённые, графики распределения строятся по случайной выборке строк); если
+    не задан, потоково обрабатываются файлы от EDA_STREAMING_MIN_BYTES.
     """
+    if output not in ("json", "png"):
+        raise HTTPException(status_code=400, detail=f"Неподдерживаемый формат EDA: {output}")
     try:
-        plots = get_plots(file)
+        if output == "json":
+            summary = await run_on_upload(eda_executor, partial(get_summary, streaming=streaming), file)
+            logger.info("EDA успешно выполнен")
+            return {"summary": summary}
+
+        plots = await run_on_upload(eda_executor, partial(get_plots, streaming=streaming), file)
         logger.info("EDA успешно выполнен")
         return {"plots": plots}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при выполнении EDA: {e}")
         return JSONResponse(status_code=500, content={"detail": f"Ошибка при выполнении EDA: {str(e)}"})
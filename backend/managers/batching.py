@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import contextvars
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class MicroBatcher:
+    """
+    Объединяет одновременные запросы в пакеты и обрабатывает каждый пакет одним вызовом.
+
+    name: имя для логов
+    fn: функция fn(key, items), возвращающая список результатов той же длины, что и items
+    executor: BoundedExecutor, в котором выполняется fn
+    max_batch_size: пакет отправляется сразу, как только набирается столько элементов
+    max_wait_us: сколько микросекунд первый запрос пакета ждёт остальных
+    Пакеты собираются отдельно для каждого ключа (например, имени модели).
+    Методы вызываются только из цикла событий.
+    """
+
+    def __init__(self, name: str, fn, executor, max_batch_size: int, max_wait_us: int):
+        self.name = name
+        self.fn = fn
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_us) / 1_000_000
+        self._pending = {}
+        self._tasks = set()
+
+    async def submit(self, key, items: list) -> list:
+        """
+        Добавляет элементы в пакет для ключа key и возвращает их результаты.
+
+        Если пакет из нескольких запросов завершился ошибкой, каждый запрос повторяется
+        отдельно, и ошибку получают только запросы, которые не удалось обработать
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = {"requests": [], "size": 0, "timer": None}
+            if self.max_wait > 0:
+                batch["timer"] = loop.call_later(self.max_wait, self._flush, key)
+            else:
+                batch["timer"] = loop.call_soon(self._flush, key)
+        batch["requests"].append((items, future))
+        batch["size"] += len(items)
+        if batch["size"] >= self.max_batch_size:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key):
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        batch["timer"].cancel()
+        # Пакет обслуживает несколько запросов, поэтому выполняется вне контекста
+        # запроса, вызвавшего отправку: этапы пакета не относятся к одному запросу
+        task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._run(key, batch["requests"]))
+        # Цикл событий хранит только слабые ссылки на задачи: без сильной ссылки
+        # задача пакета может быть удалена сборщиком мусора до завершения
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def shutdown(self):
+        """
+        Отправляет накопленные пакеты и дожидается завершения всех задач пакетов.
+        """
+        for key in list(self._pending):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, key, requests: list):
+        items = [item for request_items, _ in requests for item in request_items]
+        try:
+            results = await self.executor.run(self.fn, key, items)
+        except Exception as e:
+            logger.error(f"Ошибка при обработке пакета {self.name} ({len(items)} элементов): {e}")
+            if len(requests) == 1:
+                _, future = requests[0]
+                if not future.done():
+                    future.set_exception(e)
+                return
+            # Ошибку мог вызвать один запрос: повторяем каждый запрос отдельно,
+            # чтобы она не передавалась остальным запросам пакета
+            await asyncio.gather(*(self._run(key, [request]) for request in requests))
+            return
+
+        start = 0
+        for request_items, future in requests:
+            end = start + len(request_items)
+            if not future.done():
+                future.set_result(results[start:end])
+            start = end
@@ -0,0 +1,243 @@
+import os
+import logging
+import tempfile
+
+import pandas as pd
+from fastapi import HTTPException, UploadFile
+
+from config import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_SIZE
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Поддерживаемые форматы входных данных
+CSV_FORMAT = "csv"
+PARQUET_FORMAT = "parquet"
+ARROW_FILE_FORMAT = "arrow"
+ARROW_STREAM_FORMAT = "arrow_stream"
+
+CONTENT_TYPE_FORMATS = {
+    "text/csv": CSV_FORMAT,
+    "application/vnd.apache.parquet": PARQUET_FORMAT,
+    "application/x-parquet": PARQUET_FORMAT,
+    "application/parquet": PARQUET_FORMAT,
+    "application/vnd.apache.arrow.file": ARROW_FILE_FORMAT,
+    "application/x-feather": ARROW_FILE_FORMAT,
+    "application/vnd.apache.arrow.stream": ARROW_STREAM_FORMAT,
+}
+PARQUET_MAGIC = b"PAR1"
+ARROW_FILE_MAGIC = b"ARROW1"
+ARROW_STREAM_MAGIC = b"\xff\xff\xff\xff"
+
+
+def _raise_too_large(size: int, max_bytes: int):
+    logger.error(f"Размер файла {size} байт превышает лимит {max_bytes} байт")
+    raise HTTPException(status_code=413, detail=f"Размер файла превышает лимит {max_bytes} байт")
+
+
+def _uploaded_size(fileobj):
+    """
+    Возвращает размер файла, если объект поддерживает перемещение, иначе None.
+    """
+    try:
+        if not fileobj.seekable():
+            return None
+        size = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(0)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+def spool_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> str:
+    """
+    Копирует загруженный файл во временный файл на диске блоками.
+
+    file: загруженный пользователем файл
+    max_bytes: максимальный допустимый размер файла
+    Возвращает путь к временному файлу; удалять его должен вызывающий код.
+    Генерирует HTTPException 413, если файл превышает лимит
+    """
+    written = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".upload") as tmp:
+        try:
+            while True:
+                chunk = file.file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    _raise_too_large(written, max_bytes)
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    logger.info(f"Загруженный файл ({written} байт) сохранён во временный файл {tmp.name}")
+    return tmp.name
+
+
+def detect_format(source, content_type: str = None) -> str:
+    """
+    Определяет формат данных по сигнатуре файла, а при её отсутствии по content type.
+
+    source: путь к файлу или бинарный объект файла с поддержкой перемещения
+    content_type: MIME-тип, переданный клиентом
+    Возвращает один из CSV_FORMAT, PARQUET_FORMAT, ARROW_FILE_FORMAT, ARROW_STREAM_FORMAT
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            head = f.read(len(ARROW_FILE_MAGIC))
+    else:
+        position = source.tell()
+        head = source.read(len(ARROW_FILE_MAGIC))
+        source.seek(position)
+
+    if head.startswith(PARQUET_MAGIC):
+        return PARQUET_FORMAT
+    if head.startswith(ARROW_FILE_MAGIC):
+        return ARROW_FILE_FORMAT
+    if head.startswith(ARROW_STREAM_MAGIC):
+        return ARROW_STREAM_FORMAT
+    if content_type:
+        return CONTENT_TYPE_FORMATS.get(content_type.split(";")[0].strip().lower(), CSV_FORMAT)
+    return CSV_FORMAT
+
+
+def _project(names, usecols):
+    if usecols is None:
+        return None
+    return [name for name in names if usecols(name)]
+
+
+def _open_ipc(source, data_format: str, usecols=None):
+    """
+    Открывает файл Arrow IPC; при заданном usecols остальные столбцы не читаются
+    (IpcReadOptions.included_fields), а не отбрасываются после чтения.
+
+    Возвращает RecordBatchFileReader или RecordBatchStreamReader
+    """
+    import pyarrow.ipc
+
+    if data_format == ARROW_FILE_FORMAT:
+        open_reader = pyarrow.ipc.open_file
+    elif data_format == ARROW_STREAM_FORMAT:
+        open_reader = pyarrow.ipc.open_stream
+    else:
+        raise ValueError(f"Неподдерживаемый формат данных: {data_format}")
+    reader = open_reader(source)
+    if usecols is None:
+        return reader
+    # Схема читается первым открытием, данные - вторым, только для нужных столбцов
+    if not isinstance(source, (str, os.PathLike)):
+        source.seek(0)
+    included_fields = [index for index, name in enumerate(reader.schema.names) if usecols(name)]
+    return open_reader(source, options=pyarrow.ipc.IpcReadOptions(included_fields=included_fields))
+
+
+def read_data(source, data_format: str = None, content_type: str = None, usecols=None) -> pd.DataFrame:
+    """
+    Читает CSV, Parquet или Arrow IPC (Feather) в DataFrame.
+
+    source: путь к файлу или бинарный объект файла с поддержкой перемещения
+    data_format: формат данных; если не задан, определяется через detect_format
+    content_type: MIME-тип, переданный клиентом
+    usecols: функция, отбирающая нужные столбцы по имени; для колоночных форматов
+    остальные столбцы не читаются вовсе
+    """
+    data_format = data_format or detect_format(source, content_type)
+    if data_format == CSV_FORMAT:
+        return pd.read_csv(source, encoding='utf-8', usecols=usecols)
+
+    if data_format == PARQUET_FORMAT:
+        import pyarrow.parquet
+
+        columns = _project(pyarrow.parquet.ParquetFile(source).schema_arrow.names, usecols)
+        if not isinstance(source, (str, os.PathLike)):
+            source.seek(0)
+        return pd.read_parquet(source, columns=columns)
+    return _open_ipc(source, data_format, usecols).read_all().to_pandas()
+
+
+def iter_data_chunks(path: str, chunk_size: int, data_format: str = None, usecols=None):
+    """
+    Читает файл блоками строк, не загружая его целиком в память.
+
+    path: путь к файлу
+    chunk_size: количество строк в блоке (для Arrow IPC блоки совпадают с батчами файла)
+    data_format: формат данных; если не задан, определяется по сигнатуре файла
+    usecols: функция, отбирающая нужные столбцы по имени
+    Возвращает генератор DataFrame
+    """
+    data_format = data_format or detect_format(path)
+    if data_format == CSV_FORMAT:
+        yield from pd.read_csv(path, encoding='utf-8', usecols=usecols, chunksize=chunk_size)
+        return
+
+    if data_format == PARQUET_FORMAT:
+        import pyarrow.parquet
+
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        columns = _project(parquet_file.schema_arrow.names, usecols)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+        return
+    reader = _open_ipc(path, data_format, usecols)
+    if data_format == ARROW_FILE_FORMAT:
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    else:
+        batches = iter(reader)
+    for batch in batches:
+        yield batch.to_pandas()
+
+
+def check_upload_size(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bool:
+    """
+    Проверяет размер загруженного файла без чтения его содержимого.
+
+    file: загруженный пользователем файл
+    max_bytes: максимальный допустимый размер файла
+    Возвращает False, если размер нельзя узнать (объект не поддерживает перемещение);
+    в этом случае файл нужно копировать через spool_upload
+    Генерирует HTTPException 413, если файл превышает лимит
+    """
+    size = _uploaded_size(file.file)
+    if size is None:
+        return False
+    if size > max_bytes:
+        _raise_too_large(size, max_bytes)
+    return True
+
+
+def read_uploaded_file(file: UploadFile, usecols=None, max_bytes: int = MAX_UPLOAD_BYTES) -> pd.DataFrame:
+    """
+    Читает загруженный файл (CSV, Parquet или Arrow IPC) без промежуточной строковой копии.
+
+    file: загруженный пользователем файл
+    usecols: функция, отбирающая нужные столбцы по имени
+    max_bytes: максимальный допустимый размер файла
+    Если объект файла поддерживает перемещение (UploadFile уже хранит большие файлы
+    на диске), данные разбираются прямо из бинарного потока; иначе файл сначала
+    копируется на диск блоками.
+    Генерирует HTTPException 413, если файл превышает лимит
+    """
+    if check_upload_size(file, max_bytes):
+        return read_data(file.file, content_type=file.content_type, usecols=usecols)
+
+    path = spool_upload(file, max_bytes)
+    try:
+        return read_data(path, content_type=file.content_type, usecols=usecols)
+    finally:
+        os.unlink(path)
+
+
+def read_data_file(path: str, data_format: str = None, usecols=None) -> pd.DataFrame:
+    """
+    Читает файл с диска (CSV, Parquet или Arrow IPC).
+
+    path: путь к файлу
+    data_format: формат данных; если не задан, определяется по сигнатуре файла
+    usecols: функция, отбирающая нужные столбцы по имени
+    """
+    return read_data(path, data_format=data_format, usecols=usecols)
@@ -0,0 +1,186 @@
+import logging
+
+import numpy as np
+
+from config import EVALUATION_ALERT_BUDGETS, EVALUATION_SCORE_BINS
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+def confusion_counts(actual: np.ndarray, predicted: np.ndarray, n_classes: int) -> np.ndarray:
+    """
+    Строит матрицу ошибок по номерам классов (строки - истинные классы, столбцы - предсказанные).
+    """
+    flat = np.bincount(actual * n_classes + predicted, minlength=n_classes * n_classes)
+    return flat.reshape(n_classes, n_classes)
+
+
+def metrics_from_confusion(confusion: np.ndarray, suffix: str) -> dict:
+    """
+    Считает accuracy и взвешенные по поддержке precision, recall и f1 по матрице ошибок,
+    как accuracy_score и *_score(average='weighted') (при делении на ноль метрика класса равна 0).
+
+    confusion: матрица ошибок (строки - истинные классы, столбцы - предсказанные)
+    suffix: суффикс имён метрик ('train' или 'test')
+    """
+    confusion = np.asarray(confusion, dtype=np.float64)
+    total = confusion.sum()
+    correct = np.diag(confusion)
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, correct / predicted, 0.0)
+        recall = np.where(support > 0, correct / support, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    weights = support / total if total else support
+    return {
+        f"accuracy_{suffix}": float(correct.sum() / total) if total else 0.0,
+        f"f1_{suffix}": float((f1 * weights).sum()),
+        f"precision_{suffix}": float((precision * weights).sum()),
+        f"recall_{suffix}": float((recall * weights).sum()),
+    }
+
+
+def _budget_name(budget: float, suffix: str) -> str:
+    return f"precision_at_{budget * 100:g}pct_{suffix}"
+
+
+def ranking_from_counts(positives: np.ndarray, negatives: np.ndarray, suffix: str,
+                        budgets=EVALUATION_ALERT_BUDGETS) -> dict:
+    """
+    Считает метрики ранжирования по числу положительных и отрицательных примеров
+    в группах с одинаковой оценкой, упорядоченных по убыванию оценки.
+
+    positives, negatives: количества примеров в группах
+    suffix: суффикс имён метрик
+    budgets: доли транзакций, на которые поднимается тревога (precision при бюджете)
+    Возвращает ROC-AUC, PR-AUC (average precision, как average_precision_score)
+    и precision среди доли budget транзакций с наибольшей оценкой; внутри группы
+    положительные примеры считаются распределёнными равномерно
+    """
+    positives = np.asarray(positives, dtype=np.float64)
+    negatives = np.asarray(negatives, dtype=np.float64)
+    tps = np.cumsum(positives)
+    fps = np.cumsum(negatives)
+    n_pos, n_neg = (tps[-1], fps[-1]) if len(tps) else (0.0, 0.0)
+    total = n_pos + n_neg
+
+    metrics = {}
+    if n_pos > 0 and n_neg > 0:
+        tpr = np.concatenate([[0.0], tps / n_pos])
+        fpr = np.concatenate([[0.0], fps / n_neg])
+        metrics[f"roc_auc_{suffix}"] = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+        precision = tps / np.maximum(tps + fps, 1)
+        metrics[f"pr_auc_{suffix}"] = float(np.sum(np.diff(np.concatenate([[0.0], tps / n_pos])) * precision))
+    else:
+        # Метрики ранжирования не определены, если в выборке один класс
+        metrics[f"roc_auc_{suffix}"] = None
+        metrics[f"pr_auc_{suffix}"] = None
+
+    sizes = positives + negatives
+    seen = np.cumsum(sizes)
+    for budget in budgets:
+        alerts = int(np.ceil(budget * total))
+        if alerts == 0:
+            metrics[_budget_name(budget, suffix)] = None
+            continue
+        group = int(np.searchsorted(seen, alerts))
+        before = seen[group - 1] if group else 0.0
+        tp_before = tps[group - 1] if group else 0.0
+        taken = (alerts - before) / sizes[group] if sizes[group] else 0.0
+        metrics[_budget_name(budget, suffix)] = float((tp_before + taken * positives[group]) / alerts)
+    return metrics
+
+
+def metric_names(suffixes=("train", "test"), budgets=EVALUATION_ALERT_BUDGETS) -> list:
+    """
+    Возвращает имена метрик, которые считает evaluate_split для бинарной классификации.
+
+    suffixes: суффиксы имён метрик
+    budgets: доли транзакций для precision при бюджете
+    """
+    names = []
+    for suffix in suffixes:
+        names.extend(f"{name}_{suffix}" for name in ("accuracy", "f1", "precision", "recall", "roc_auc", "pr_auc"))
+        names.extend(_budget_name(budget, suffix) for budget in budgets)
+    return names
+
+
+def ranking_metrics(actual: np.ndarray, scores: np.ndarray, suffix: str, budgets=EVALUATION_ALERT_BUDGETS) -> dict:
+    """
+    Точные метрики ранжирования по оценкам положительного класса.
+
+    actual: 1 для положительного класса, 0 для остальных
+    scores: оценки (вероятности) положительного класса
+    """
+    order = np.argsort(-scores, kind='mergesort')
+    sorted_scores = scores[order]
+    sorted_actual = actual[order]
+    # Границы групп одинаковых оценок
+    starts = np.flatnonzero(np.concatenate([[True], sorted_scores[1:] != sorted_scores[:-1]]))
+    positives = np.add.reduceat(sorted_actual, starts) if len(starts) else np.zeros(0)
+    negatives = np.diff(np.append(starts, len(scores))) - positives
+    return ranking_from_counts(positives, negatives, suffix, budgets)
+
+
+class ScoreHistogram:
+    """
+    Накопитель оценок положительного класса для потокового подсчёта метрик ранжирования.
+
+    bins: количество интервалов на отрезке [0, 1]; метрики приближённые,
+    оценки внутри интервала считаются одинаковыми
+    """
+
+    def __init__(self, bins: int = EVALUATION_SCORE_BINS):
+        self.bins = bins
+        self.positives = np.zeros(bins, dtype=np.int64)
+        self.negatives = np.zeros(bins, dtype=np.int64)
+
+    def add(self, actual: np.ndarray, scores: np.ndarray):
+        index = np.minimum((scores * self.bins).astype(np.int64), self.bins - 1)
+        self.positives += np.bincount(index[actual == 1], minlength=self.bins)
+        self.negatives += np.bincount(index[actual != 1], minlength=self.bins)
+
+    def metrics(self, suffix: str, budgets=EVALUATION_ALERT_BUDGETS) -> dict:
+        return ranking_from_counts(self.positives[::-1], self.negatives[::-1], suffix, budgets)
+
+
+def score_model(model, X):
+    """
+    Выполняет один проход модели по данным.
+
+    Возвращает кортеж (номера предсказанных классов в model.classes_, вероятности классов или None)
+    """
+    if hasattr(model, "predict_proba"):
+        probabilities = model.predict_proba(X)
+        return probabilities.argmax(axis=1), probabilities
+    return np.searchsorted(model.classes_, model.predict(X)), None
+
+
+def evaluate_split(model, X, y, suffix: str) -> dict:
+    """
+    Считает все метрики модели на выборке за один проход модели.
+
+    model: обученный классификатор с атрибутом classes_
+    X, y: признаки и истинные метки
+    suffix: суффикс имён метрик ('train' или 'test')
+    Для бинарной классификации с predict_proba добавляются метрики ранжирования
+    по вероятности второго класса (is_fraud = 1)
+    """
+    classes = np.asarray(model.classes_)
+    y = np.asarray(y)
+    predicted, probabilities = score_model(model, X)
+    actual = np.searchsorted(classes, y)
+    known = (actual < len(classes)) & (classes[np.minimum(actual, len(classes) - 1)] == y)
+    if not known.all():
+        # Классы, которых не было при обучении, не могут быть предсказаны: добавляем их в матрицу
+        classes = np.union1d(classes, y)
+        predicted = np.searchsorted(classes, np.asarray(model.classes_)[predicted])
+        actual = np.searchsorted(classes, y)
+
+    metrics = metrics_from_confusion(confusion_counts(actual, predicted, len(classes)), suffix)
+    if probabilities is not None and probabilities.shape[1] == 2:
+        metrics.update(ranking_metrics((y == model.classes_[1]).astype(np.int64), probabilities[:, 1], suffix))
+    return metrics
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+
+from fastapi import HTTPException
+
+from managers.instrumentation import EXECUTOR_IN_FLIGHT, run_journaled, replay_journal
+from config import (
+    PREDICT_EXECUTOR, PREDICT_WORKERS, PREDICT_MAX_QUEUE,
+    EDA_EXECUTOR, EDA_WORKERS, EDA_MAX_QUEUE
+)
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+EXECUTOR_KINDS = ("thread", "process")
+
+
+class BoundedExecutor:
+    """
+    Пул потоков или процессов с ограничением числа ожидающих задач.
+
+    name: имя пула для логов и ошибок
+    kind: 'thread' для кода, отпускающего GIL (pandas, numpy, sklearn),
+    'process' для чистого Python и matplotlib
+    max_workers: размер пула
+    max_queue: количество задач, которые могут ждать свободного исполнителя
+    В пул потоков передаётся контекст (contextvars) вызывающего кода, чтобы этапы
+    попадали в Server-Timing запроса; этапы и счётчики задач пула процессов
+    возвращаются вместе с результатом и учитываются в родительском процессе.
+    Пул создаётся при первом использовании. Методы вызываются только из цикла событий.
+    """
+
+    def __init__(self, name: str, kind: str, max_workers: int, max_queue: int):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Неизвестный тип пула {name}: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.in_flight = 0
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            logger.info(f"Создан пул {self.name} ({self.kind}, исполнителей: {self.max_workers})")
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Выполняет функцию в пуле и возвращает её результат.
+
+        Генерирует HTTPException 503, если пул и его очередь заполнены
+        """
+        if self.in_flight >= self.max_workers + self.max_queue:
+            logger.warning(f"Пул {self.name} перегружен, задач в работе: {self.in_flight}")
+            raise HTTPException(status_code=503, detail=f"Сервис перегружен ({self.name}), повторите запрос позже")
+        self.in_flight += 1
+        EXECUTOR_IN_FLIGHT.inc(self.name)
+        try:
+            loop = asyncio.get_running_loop()
+            call = partial(fn, *args, **kwargs)
+            if self.kind == "thread":
+                call = partial(contextvars.copy_context().run, call)
+                return await loop.run_in_executor(self._get_executor(), call)
+            result, journal = await loop.run_in_executor(self._get_executor(), partial(run_journaled, call))
+            replay_journal(journal)
+            return result
+        finally:
+            self.in_flight -= 1
+            EXECUTOR_IN_FLIGHT.dec(self.name)
+
+    def shutdown(self):
+        """
+        Дожидается выполняющихся задач и отменяет ожидающие.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info(f"Пул {self.name} остановлен")
+
+
+predict_executor = BoundedExecutor("predict", PREDICT_EXECUTOR, PREDICT_WORKERS, PREDICT_MAX_QUEUE)
+eda_executor = BoundedExecutor("eda", EDA_EXECUTOR, EDA_WORKERS, EDA_MAX_QUEUE)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import shutil
+import logging
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import FEATURE_CACHE_DIR, FEATURE_CACHE_MAX_BYTES, REQUIRED_COLUMNS, TARGET_COLUMN, PREPROCESSING_MODE
+from preprocessing import PREPROCESSING_VERSION
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+_lock = threading.Lock()
+
+
+def feature_cache_key(path: str) -> str:
+    """
+    Вычисляет ключ кэша по содержимому файла и версии предобработки.
+
+    path: путь к файлу с исходными данными
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"v{PREPROCESSING_VERSION}:{PREPROCESSING_MODE}:".encode())
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _entry_dir(key: str) -> str:
+    return os.path.join(FEATURE_CACHE_DIR, key)
+
+
+def get_cached_features(key: str):
+    """
+    Возвращает признаки из кэша или None, если записи нет.
+
+    key: ключ, полученный из feature_cache_key
+    Возвращает кортеж (X, y, encoders); X и y отображаются в память только для чтения
+    """
+    entry_dir = _entry_dir(key)
+    meta_path = os.path.join(entry_dir, "meta.json")
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        X = np.load(os.path.join(entry_dir, "X.npy"), mmap_mode='r')
+        y = np.load(os.path.join(entry_dir, "y.npy"), mmap_mode='r')
+    except (FileNotFoundError, ValueError) as e:
+        if os.path.exists(entry_dir):
+            logger.warning(f"Повреждённая запись кэша признаков {key}: {e}")
+        return None
+
+    # Время изменения meta.json служит отметкой последнего использования для LRU
+    os.utime(meta_path)
+    logger.info(f"Признаки найдены в кэше: {key}")
+    return (
+        pd.DataFrame(X, columns=meta["columns"], copy=False),
+        pd.Series(y, name=TARGET_COLUMN, copy=False),
+        meta["encoders"],
+    )
+
+
+def put_cached_features(key: str, X: pd.DataFrame, y: pd.Series, encoders: dict):
+    """
+    Сохраняет признаки в кэш и вытесняет давно не использованные записи сверх лимита.
+
+    key: ключ, полученный из feature_cache_key
+    X: матрица признаков REQUIRED_COLUMNS
+    y: целевая переменная
+    encoders: словари кодирования категориальных признаков
+    """
+    os.makedirs(FEATURE_CACHE_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=FEATURE_CACHE_DIR, prefix=".tmp-")
+    try:
+        np.save(os.path.join(tmp_dir, "X.npy"), X[REQUIRED_COLUMNS].to_numpy(dtype=np.float64))
+        np.save(os.path.join(tmp_dir, "y.npy"), y.to_numpy())
+        with open(os.path.join(tmp_dir, "meta.json"), 'w', encoding='utf-8') as f:
+            json.dump({"columns": REQUIRED_COLUMNS, "encoders": encoders}, f, ensure_ascii=False)
+        with _lock:
+            try:
+                os.rename(tmp_dir, _entry_dir(key))
+            except OSError:
+                # Запись с таким ключом уже создана параллельной задачей
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+            _evict()
+        logger.info(f"Признаки сохранены в кэш: {key}")
+    except Exception as e:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        logger.error(f"Ошибка при сохранении признаков в кэш: {e}")
+
+
+def _dir_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def _evict():
+    entries = []
+    for entry in os.scandir(FEATURE_CACHE_DIR):
+        meta_path = os.path.join(entry.path, "meta.json")
+        if entry.is_dir() and not entry.name.startswith(".") and os.path.exists(meta_path):
+            entries.append((os.stat(meta_path).st_mtime, _dir_size(entry.path), entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= FEATURE_CACHE_MAX_BYTES:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        logger.info(f"Запись кэша признаков вытеснена: {os.path.basename(path)}")
@@ -0,0 +1,292 @@
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from time import perf_counter
+from urllib.parse import parse_qsl
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Границы корзин гистограмм длительности (секунды)
+DURATION_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0
+)
+
+_registry = []
+# Длительности этапов текущего запроса для заголовка Server-Timing (None вне запроса)
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+# Журнал измерений задачи в пуле процессов: метрики дочернего процесса не видны
+# в /metrics, поэтому записываются в журнал и учитываются в родительском процессе
+_worker_journal = contextvars.ContextVar("worker_journal", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+        if any(metric.name == name for metric in _registry):
+            raise ValueError(f"Метрика {name} уже зарегистрирована")
+        _registry.append(self)
+
+    def _samples(self):
+        if self.callback is not None:
+            return [(self.name, (), self.callback())]
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in self._values.items()]
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """
+    Монотонно растущий счётчик.
+
+    name: имя метрики
+    documentation: описание для HELP
+    labelnames: имена меток; значения меток передаются в inc позиционно
+    callback: функция без аргументов, возвращающая значение (для счётчиков, которые ведёт другой код)
+    """
+    kind = "counter"
+
+    def inc(self, *labels, value: float = 1.0):
+        journal = _worker_journal.get()
+        if journal is not None:
+            journal.append(("counter", self.name, labels, value))
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + value
+
+
+class Gauge(_Metric):
+    """
+    Значение, которое может как расти, так и уменьшаться.
+    """
+    kind = "gauge"
+
+    def inc(self, *labels, value: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + value
+
+    def dec(self, *labels, value: float = 1.0):
+        self.inc(*labels, value=-value)
+
+
+class Histogram(_Metric):
+    """
+    Гистограмма с фиксированными корзинами.
+
+    buckets: верхние границы корзин по возрастанию
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = [(labels, list(state[0]), state[1], state[2]) for labels, state in self._values.items()]
+        for labels, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+REQUESTS_TOTAL = Counter("http_requests_total", "Количество HTTP-запросов", ("method", "path", "status"))
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Длительность обработки HTTP-запросов", ("method", "path")
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "Количество обрабатываемых HTTP-запросов")
+REQUEST_BYTES = Counter("http_request_bytes_total", "Объём принятых тел запросов в байтах", ("path",))
+STAGE_DURATION = Histogram("stage_duration_seconds", "Длительность этапов обработки", ("stage",))
+ROWS_PROCESSED = Counter("rows_processed_total", "Количество обработанных строк данных", ("operation",))
+EXECUTOR_IN_FLIGHT = Gauge("executor_tasks_in_flight", "Количество задач в пулах исполнителей", ("executor",))
+
+
+def render_metrics() -> str:
+    """
+    Возвращает все зарегистрированные метрики в текстовом формате Prometheus.
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def record_stage(stage: str, duration: float):
+    """
+    Учитывает длительность этапа в гистограмме и в Server-Timing текущего запроса.
+    """
+    journal = _worker_journal.get()
+    if journal is not None:
+        journal.append(("stage", stage, duration))
+        return
+    STAGE_DURATION.observe(duration, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, duration))
+
+
+@contextmanager
+def timed(stage: str):
+    """
+    Измеряет длительность блока кода как этапа stage.
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, perf_counter() - start)
+
+
+def run_journaled(fn):
+    """
+    Выполняет fn() в дочернем процессе пула, записывая этапы и счётчики в журнал.
+
+    Возвращает кортеж (результат fn, журнал) для replay_journal в родительском процессе
+    """
+    journal = []
+    token = _worker_journal.set(journal)
+    try:
+        return fn(), journal
+    finally:
+        _worker_journal.reset(token)
+
+
+def replay_journal(journal: list):
+    """
+    Учитывает измерения задачи, выполненной в пуле процессов (см. run_journaled),
+    в метриках и Server-Timing текущего запроса.
+    """
+    metrics = {metric.name: metric for metric in _registry}
+    for entry in journal:
+        if entry[0] == "stage":
+            record_stage(entry[1], entry[2])
+        else:
+            _, name, labels, value = entry
+            metrics[name].inc(*labels, value=value)
+
+
+def _route_path(scope) -> str:
+    route = scope.get("route")
+    # Шаблон маршрута вместо фактического пути, чтобы число меток не росло с именами моделей
+    return getattr(route, "path", None) or "unmatched"
+
+
+_TRUE_VALUES = ("1", "true", "yes")
+
+
+def _server_timing_requested(scope) -> bool:
+    """
+    Проверяет, запросил ли клиент Server-Timing для этого запроса
+    (заголовок X-Server-Timing или параметр строки запроса server_timing).
+    """
+    for name, value in scope.get("headers", ()):
+        if name == b"x-server-timing":
+            return value.decode("latin-1").strip().lower() in _TRUE_VALUES
+    for name, value in parse_qsl(scope.get("query_string", b"").decode("latin-1")):
+        if name == "server_timing":
+            return value.strip().lower() in _TRUE_VALUES
+    return False
+
+
+class MetricsMiddleware:
+    """
+    ASGI-промежуточный слой: учитывает запросы, их длительность, объём тел
+    и число одновременно обрабатываемых запросов.
+
+    app: ASGI-приложение
+    server_timing: добавлять заголовок Server-Timing с длительностями этапов во все ответы;
+    отдельный запрос включает его заголовком X-Server-Timing: 1 или параметром server_timing=1
+    Этапы, выполняемые в пуле потоков, попадают в заголовок, если пул передаёт контекст
+    (contextvars), в пуле процессов - через журнал (run_journaled); этапы потоковых ответов
+    завершаются после отправки заголовков и в него не попадают.
+    """
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        timings = []
+        token = _request_timings.set(timings)
+        status = 500
+        server_timing = self.server_timing or _server_timing_requested(scope)
+        REQUESTS_IN_FLIGHT.inc()
+
+        async def send_with_metrics(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if server_timing:
+                    entries = [f"{stage};dur={duration * 1000:.3f}" for stage, duration in timings]
+                    entries.append(f"total;dur={(perf_counter() - start) * 1000:.3f}")
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _request_timings.reset(token)
+            REQUESTS_IN_FLIGHT.dec()
+            path = _route_path(scope)
+            method = scope["method"]
+            REQUEST_DURATION.observe(perf_counter() - start, method, path)
+            REQUESTS_TOTAL.inc(method, path, str(status))
+            for name, value in scope.get("headers", ()):
+                if name == b"content-length":
+                    REQUEST_BYTES.inc(path, value=int(value))
+                    break
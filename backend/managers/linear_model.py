@@ -0,0 +1,125 @@
+import zipfile
+import logging
+
+import numpy as np
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Версия формата; увеличивается при несовместимых изменениях состава массивов
+LINEAR_FORMAT = "linear"
+LINEAR_FORMAT_VERSION = 1
+
+
+def is_linear_classifier(model) -> bool:
+    """
+    Проверяет, можно ли экспортировать модель в компактный формат.
+    """
+    return all(hasattr(model, attr) for attr in ("coef_", "intercept_", "classes_"))
+
+
+def export_linear_model(model, path: str):
+    """
+    Сохраняет линейный классификатор в файл .npz без pickle.
+
+    model: обученная модель с атрибутами coef_, intercept_, classes_ (например, LogisticRegression)
+    path: путь к файлу .npz
+    Массивы хранятся без сжатия, поэтому файл можно отобразить в память
+    """
+    feature_names = getattr(model, "feature_names_in_", None)
+    np.savez(
+        path,
+        format=np.array(LINEAR_FORMAT),
+        version=np.array(LINEAR_FORMAT_VERSION),
+        coef=np.ascontiguousarray(model.coef_, dtype=np.float64),
+        intercept=np.ascontiguousarray(model.intercept_, dtype=np.float64),
+        classes=np.asarray(model.classes_),
+        feature_names=np.array([] if feature_names is None else list(feature_names), dtype=str),
+    )
+
+
+def _mmap_npz(path: str) -> dict:
+    """
+    Отображает массивы несжатого .npz в память без копирования.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Массив {info.filename} сжат и не может быть отображён в память")
+            # Локальный заголовок: 30 байт + имя файла + дополнительное поле
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype='<u2')
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if dtype.hasobject:
+                raise ValueError(f"Массив {name} содержит объекты Python")
+            arrays[name] = np.memmap(
+                path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                order='F' if fortran_order else 'C'
+            )
+    return arrays
+
+
+class LinearScorer:
+    """
+    Модель линейной классификации на NumPy, совместимая по predict с LogisticRegression.
+
+    coef: матрица коэффициентов (n_outputs, n_features)
+    intercept: свободные члены (n_outputs,)
+    classes: метки классов
+    feature_names: порядок признаков; DataFrame на входе переупорядочивается по нему
+    """
+
+    def __init__(self, coef, intercept, classes, feature_names=None):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = classes
+        self.feature_names_in_ = feature_names if feature_names is not None and len(feature_names) else None
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "LinearScorer":
+        """
+        Загружает модель из файла .npz, по умолчанию отображая массивы в память.
+        """
+        if mmap:
+            arrays = _mmap_npz(path)
+        else:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+        if str(arrays["format"][()]) != LINEAR_FORMAT or int(arrays["version"][()]) != LINEAR_FORMAT_VERSION:
+            raise ValueError(
+                f"Неподдерживаемый формат модели: {arrays['format'][()]} v{arrays['version'][()]}"
+            )
+        return cls(arrays["coef"], arrays["intercept"], arrays["classes"], arrays["feature_names"])
+
+    def _features(self, X) -> np.ndarray:
+        if self.feature_names_in_ is not None and hasattr(X, "columns"):
+            X = X[list(self.feature_names_in_)]
+        return np.asarray(X, dtype=np.float64)
+
+    def decision_function(self, X) -> np.ndarray:
+        scores = self._features(X) @ self.coef_.T + self.intercept_
+        return scores.ravel() if scores.shape[1] == 1 else scores
+
+    def predict(self, X) -> np.ndarray:
+        scores = self.decision_function(X)
+        if scores.ndim == 1:
+            return self.classes_[(scores > 0).astype(np.intp)]
+        return self.classes_[scores.argmax(axis=1)]
+
+    def predict_proba(self, X) -> np.ndarray:
+        scores = self.decision_function(X)
+        if scores.ndim == 1:
+            positive = 1.0 / (1.0 + np.exp(-scores))
+            return np.column_stack([1.0 - positive, positive])
+        scores = scores - scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
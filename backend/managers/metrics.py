@@ -8,6 +8,7 @@ from pydantic import BaseModel
 from typing_extensions import Annotated
 
 from config import MODEL_DIR
+from managers.registry import register_metrics
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
@@ -34,7 +35,8 @@ def save_metrics(metrics: MetricsModel, model_name: Annotated[str, "Назван
 
     try:
         with open(metrics_path, 'w', encoding='utf-8') as f:
-            json.dump(metrics.dict(), f, ensure_ascii=False, indent=4)
+            json.dump(metrics.metrics, f, ensure_ascii=False, indent=4)
+        register_metrics(model_name, metrics.metrics)
         logger.info(f"Метрики для модели {model_name} успешно сохранены в {metrics_path}")
     except Exception as e:
         logger.error(f"Ошибка при сохранении метрик для модели {model_name}: {e}")
@@ -1,12 +1,21 @@
+import json
 import os
 import pickle
 import logging
+import threading
+from collections import OrderedDict
 from typing import List
 
 import pandas as pd
 from fastapi import HTTPException
 
-from config import MODEL_DIR
+from config import MODEL_DIR, MODEL_CACHE_SIZE, MODEL_CACHE_MAX_BYTES, MODEL_FORMAT, MODEL_SHARED_STORE
+from preprocessing import build_lookup_tables
+from managers.registry import register_model, refresh_artifacts, query_models
+from managers.linear_model import LinearScorer, export_linear_model, is_linear_classifier
+from managers.shared_store import (
+    materialize_model, load_shared_model, remove_shared_model, SHARED_SUFFIX, ENCODERS_SHARED_SUFFIX
+)
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -15,18 +24,100 @@ logging.basicConfig(level=logging.INFO)
 os.makedirs(MODEL_DIR, exist_ok=True)
 
 
+class ModelCache:
+    """
+    LRU-кэш загруженных моделей, общий для всех запросов процесса.
+
+    max_size: максимальное количество моделей в кэше
+    max_bytes: ограничение суммарного размера моделей (по размеру файлов .pkl)
+    Запись считается устаревшей, если изменилось время модификации файла модели
+    """
+
+    def __init__(self, max_size: int, max_bytes: int):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_name: str, mtime: float):
+        with self._lock:
+            entry = self._entries.get(model_name)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(model_name)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                self._remove(model_name)
+            self.misses += 1
+            return None
+
+    def put(self, model_name: str, mtime: float, size: int, model):
+        if self.max_size <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if model_name in self._entries:
+                self._remove(model_name)
+            self._entries[model_name] = (mtime, size, model)
+            self._total_bytes += size
+            while len(self._entries) > self.max_size or self._total_bytes > self.max_bytes:
+                evicted_name, _ = next(iter(self._entries.items()))
+                self._remove(evicted_name)
+                self.evictions += 1
+                logger.info(f"Модель {evicted_name} вытеснена из кэша")
+
+    def invalidate(self, model_name: str):
+        with self._lock:
+            if model_name in self._entries:
+                self._remove(model_name)
+
+    def _remove(self, model_name: str):
+        _, size, _ = self._entries.pop(model_name)
+        self._total_bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "models": list(self._entries.keys()),
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+model_cache = ModelCache(MODEL_CACHE_SIZE, MODEL_CACHE_MAX_BYTES)
+
+
 def save_model(model, model_name: str):
     """
     Сохраняет модель в указанной директории.
 
     model: объект обученной модели, который нужно сохранить
     model_name: уникальное имя модели, используемое для хранения
+    Для линейных классификаторов рядом с pickle сохраняется компактный файл .npz
     Возвращает полный путь к сохранённому файлу
     """
     model_path = os.path.join(MODEL_DIR, f'{model_name}.pkl')
     try:
         with open(model_path, 'wb') as f:
             pickle.dump(model, f)
+        compact_path = os.path.join(MODEL_DIR, f'{model_name}.npz')
+        if is_linear_classifier(model):
+            export_linear_model(model, compact_path)
+        elif os.path.exists(compact_path):
+            # Компактный файл прежней модели с тем же именем больше не соответствует pickle
+            os.remove(compact_path)
+        remove_shared_model(model_name)
+        model_cache.invalidate(model_name)
+        model_cache.invalidate(f"{model_name}.npz")
+        register_model(model_name, model)
         logger.info(f"Модель {model_name} успешно сохранена в {model_path}")
         return model_path
     except Exception as e:
@@ -34,37 +125,206 @@ def save_model(model, model_name: str):
         raise HTTPException(status_code=500, detail=f"Ошибка при сохранении модели: {e}")
 
 
-def load_model(model_name: str):
+def _validate_model_name(model_name: str):
+    """
+    Проверяет, что имя модели не выводит путь за пределы MODEL_DIR.
+
+    Генерирует HTTPException 400 для пустого имени, '.', имён с разделителями пути и '..'
+    """
+    if (
+        model_name in ("", ".")
+        or os.sep in model_name
+        or (os.altsep and os.altsep in model_name)
+        or ".." in model_name
+    ):
+        raise HTTPException(status_code=400, detail=f"Недопустимое имя модели: {model_name}")
+
+
+def _stat(path: str):
+    try:
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+
+def load_model(model_name: str, compact: bool = None):
     """
     Загружает модель из директории по её имени.
 
     model_name: имя модели для загрузки
+    compact: загрузить компактный файл .npz как LinearScorer (без sklearn и pickle);
+    по умолчанию определяется MODEL_FORMAT. Если .npz нет или он старше pickle,
+    загружается pickle; без pickle модель считается отсутствующей
+    При MODEL_SHARED_STORE модель из pickle размещается в общем хранилище
+    (см. managers.shared_store) и отображается в память всеми процессами сервиса.
+    Это касается только моделей, загружаемых из pickle: при MODEL_FORMAT=compact
+    линейные модели читаются из .npz, а в общем хранилище размещаются их словари
+    кодирования (см. load_encoders)
     Возвращает загруженный объект модели
     Генерирует HTTPException в случае ошибки или отсутствия файла
     """
+    _validate_model_name(model_name)
     model_path = os.path.join(MODEL_DIR, f'{model_name}.pkl')
-    if not os.path.exists(model_path):
+    compact_path = os.path.join(MODEL_DIR, f'{model_name}.npz')
+    stat = _stat(model_path)
+    if stat is None:
+        # Основной файл модели - pickle: без него модель считается удалённой.
+        # Оставшиеся производные файлы удаляет сверка реестра (registry._reconcile)
+        model_cache.invalidate(model_name)
+        model_cache.invalidate(f"{model_name}.npz")
         raise HTTPException(status_code=404, detail=f"Модель {model_name} не найдена")
 
+    compact = MODEL_FORMAT == "compact" if compact is None else compact
+    if compact:
+        compact_stat = _stat(compact_path)
+        if compact_stat is not None and compact_stat.st_mtime >= stat.st_mtime:
+            return _load_compact(model_name, compact_path, compact_stat)
+
+    model = model_cache.get(model_name, stat.st_mtime)
+    if model is not None:
+        return model
+
     try:
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        logger.info(f"Модель {model_name} успешно загружена из {model_path}")
+        model = load_shared_model(model_name, stat) if MODEL_SHARED_STORE else None
+        if model is not None:
+            logger.info(f"Модель {model_name} отображена из общего хранилища")
+        else:
+            with open(model_path, 'rb') as f:
+                model = pickle.load(f)
+            logger.info(f"Модель {model_name} успешно загружена из {model_path}")
+            if MODEL_SHARED_STORE:
+                model = _share(model, model_name, stat)
+        model_cache.put(model_name, stat.st_mtime, stat.st_size, model)
         return model
     except Exception as e:
         logger.error(f"Ошибка при загрузке модели {model_name}: {e}")
         raise HTTPException(status_code=500, detail=f"Ошибка при загрузке модели: {e}")
 
 
-def list_available_models() -> list:
+def _share(model, model_name: str, stat, suffix: str = SHARED_SUFFIX):
+    """
+    Размещает модель (или её словари кодирования) в общем хранилище и возвращает
+    отображённую копию, чтобы и этот процесс не держал собственную копию массивов
     """
-    Возвращает список доступных моделей, хранящихся в директории.
+    try:
+        materialize_model(model, model_name, stat, suffix)
+        return load_shared_model(model_name, stat, suffix) or model
+    except (OSError, pickle.PicklingError) as e:
+        logger.warning(f"Не удалось разместить модель {model_name} в общем хранилище: {e}")
+        return model
+
+
+def _load_compact(model_name: str, compact_path: str, stat):
+    cache_key = f"{model_name}.npz"
+    model = model_cache.get(cache_key, stat.st_mtime)
+    if model is not None:
+        return model
+    try:
+        model = LinearScorer.load(compact_path)
+        model_cache.put(cache_key, stat.st_mtime, stat.st_size, model)
+        logger.info(f"Модель {model_name} загружена из компактного файла {compact_path}")
+        return model
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке модели {model_name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при загрузке модели: {e}")
+
 
-    Возвращает список имён файлов моделей без расширения
-    Генерирует HTTPException в случае ошибки при чтении директории
+def save_encoders(encoders: dict, model_name: str):
     """
+    Сохраняет словари кодирования категориальных признаков рядом с метриками модели.
+
+    encoders: словарь {столбец: список категорий}, полученный при обучении
+    model_name: имя модели, к которой относятся словари
+    Возвращает путь к сохранённому файлу
+    """
+    model_dir = os.path.join(MODEL_DIR, model_name)
+    encoders_path = os.path.join(model_dir, "encoders.json")
+    os.makedirs(model_dir, exist_ok=True)
+    try:
+        with open(encoders_path, 'w', encoding='utf-8') as f:
+            json.dump(encoders, f, ensure_ascii=False)
+        model_cache.invalidate(f"{model_name}/encoders")
+        remove_shared_model(model_name, ENCODERS_SHARED_SUFFIX)
+        refresh_artifacts(model_name)
+        logger.info(f"Словари кодирования для модели {model_name} сохранены в {encoders_path}")
+        return encoders_path
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении словарей кодирования для модели {model_name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при сохранении словарей кодирования: {e}")
+
+
+def load_encoders(model_name: str):
+    """
+    Загружает словари кодирования модели в виде таблиц поиска.
+
+    model_name: имя модели
+    Возвращает словарь {столбец: pd.Index} или None, если модель обучена
+    без сохранённых словарей
+    При MODEL_SHARED_STORE таблицы поиска строятся один раз и отображаются в память
+    всеми процессами сервиса из общего хранилища
+    """
+    _validate_model_name(model_name)
+    encoders_path = os.path.join(MODEL_DIR, model_name, "encoders.json")
+    cache_key = f"{model_name}/encoders"
     try:
-        model_files = [f.replace('.pkl', '') for f in os.listdir(MODEL_DIR) if f.endswith('.pkl')]
+        stat = os.stat(encoders_path)
+    except FileNotFoundError:
+        model_cache.invalidate(cache_key)
+        return None
+
+    lookup_tables = model_cache.get(cache_key, stat.st_mtime)
+    if lookup_tables is not None:
+        return lookup_tables
+
+    try:
+        lookup_tables = load_shared_model(model_name, stat, ENCODERS_SHARED_SUFFIX) if MODEL_SHARED_STORE else None
+        if lookup_tables is not None:
+            logger.info(f"Словари кодирования для модели {model_name} отображены из общего хранилища")
+        else:
+            with open(encoders_path, 'r', encoding='utf-8') as f:
+                lookup_tables = build_lookup_tables(json.load(f))
+            logger.info(f"Словари кодирования для модели {model_name} загружены из {encoders_path}")
+            if MODEL_SHARED_STORE:
+                lookup_tables = _share(lookup_tables, model_name, stat, ENCODERS_SHARED_SUFFIX)
+        model_cache.put(cache_key, stat.st_mtime, stat.st_size, lookup_tables)
+        return lookup_tables
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке словарей кодирования для модели {model_name}: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при загрузке словарей кодирования: {e}")
+
+
+def preload_models(model_names: List[str]):
+    """
+    Заранее загружает модели в кэш, чтобы первые запросы не платили за чтение с диска.
+
+    model_names: список имён моделей для загрузки
+    Модели, которые не удалось загрузить, пропускаются с записью в лог
+    """
+    for model_name in model_names:
+        try:
+            load_model(model_name)
+            logger.info(f"Модель {model_name} предзагружена в кэш")
+        except HTTPException as e:
+            logger.warning(f"Не удалось предзагрузить модель {model_name}: {e.detail}")
+
+
+def get_cache_stats() -> dict:
+    """
+    Возвращает состояние кэша моделей: содержимое, размер и счётчики попаданий/промахов.
+    """
+    return model_cache.stats()
+
+
+def list_available_models(**query) -> list:
+    """
+    Возвращает список доступных моделей из реестра.
+
+    query: параметры постраничного вывода, сортировки и отбора (см. registry.query_models)
+    Возвращает список имён моделей
+    Генерирует HTTPException в случае ошибки при чтении реестра
+    """
+    try:
+        model_files = [item["name"] for item in query_models(**query)["items"]]
         logger.info(f"Доступные модели: {model_files}")
         return model_files
     except Exception as e:
@@ -72,6 +332,21 @@ def list_available_models() -> list:
         raise HTTPException(status_code=500, detail=f"Ошибка при получении списка моделей: {e}")
 
 
+def search_models(**query) -> dict:
+    """
+    Возвращает страницу реестра моделей с метаданными: дата создания, параметры,
+    метрики и размеры артефактов.
+
+    query: параметры постраничного вывода, сортировки и отбора (см. registry.query_models)
+    Генерирует HTTPException в случае ошибки при чтении реестра
+    """
+    try:
+        return query_models(**query)
+    except Exception as e:
+        logger.error(f"Ошибка при поиске моделей в реестре: {e}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при поиске моделей: {e}")
+
+
 class DataPreprocessingError(Exception):
     """
     Исключение для ошибок, возникающих во время предобработки данных.
@@ -0,0 +1,282 @@
+import json
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from config import MODEL_DIR, REGISTRY_WAL
+from managers.shared_store import SHARED_SUFFIX, ENCODERS_SHARED_SUFFIX
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+REGISTRY_PATH = os.path.join(MODEL_DIR, "registry.db")
+# Файлы, производные от pickle модели: без него они устарели и удаляются при сверке
+DERIVED_SUFFIXES = (".npz", ENCODERS_SHARED_SUFFIX, SHARED_SUFFIX)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    name TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    model_type TEXT,
+    params TEXT,
+    metrics TEXT,
+    model_bytes INTEGER,
+    artifact_bytes INTEGER
+);
+CREATE INDEX IF NOT EXISTS models_created_at ON models (created_at);
+CREATE TABLE IF NOT EXISTS model_metrics (
+    name TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (name, metric)
+);
+CREATE INDEX IF NOT EXISTS model_metrics_value ON model_metrics (metric, value);
+"""
+
+_init_lock = threading.Lock()
+_initialized = False
+# Время изменения MODEL_DIR при последней сверке реестра с файлами
+_reconciled_mtime = None
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized, _reconciled_mtime
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    connection = sqlite3.connect(REGISTRY_PATH, timeout=30)
+    connection.row_factory = sqlite3.Row
+    if not _initialized:
+        with _init_lock:
+            if not _initialized:
+                if REGISTRY_WAL:
+                    connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+                _initialized = True
+    # Добавление и удаление файлов моделей меняет время изменения каталога:
+    # реестр сверяется с файлами только после таких изменений
+    mtime = os.stat(MODEL_DIR).st_mtime_ns
+    if mtime != _reconciled_mtime:
+        with _init_lock:
+            if mtime != _reconciled_mtime:
+                _reconcile(connection)
+                _reconciled_mtime = mtime
+    return connection
+
+
+@contextmanager
+def _transaction():
+    connection = _connect()
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
+
+
+def _artifact_bytes(name: str) -> int:
+    model_dir = os.path.join(MODEL_DIR, name)
+    if not os.path.isdir(model_dir):
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(model_dir) if entry.is_file())
+
+
+def _model_bytes(name: str):
+    try:
+        return os.path.getsize(os.path.join(MODEL_DIR, f"{name}.pkl"))
+    except OSError:
+        return None
+
+
+def _write_metrics(connection: sqlite3.Connection, name: str, metrics: dict):
+    connection.execute(
+        "UPDATE models SET metrics = ?, artifact_bytes = ? WHERE name = ?",
+        (json.dumps(metrics, ensure_ascii=False), _artifact_bytes(name), name),
+    )
+    connection.execute("DELETE FROM model_metrics WHERE name = ?", (name,))
+    connection.executemany(
+        "INSERT INTO model_metrics (name, metric, value) VALUES (?, ?, ?)",
+        [(name, metric, float(value)) for metric, value in metrics.items() if isinstance(value, (int, float))],
+    )
+
+
+def _reconcile(connection: sqlite3.Connection):
+    """
+    Сверяет реестр с файлами моделей: добавляет модели, сохранённые в обход реестра
+    (или до его появления), удаляет записи и производные файлы (.npz, общее хранилище)
+    моделей, pickle которых удалён, и обновляет размеры моделей, файлы которых
+    изменились после регистрации.
+    """
+    entries = os.listdir(MODEL_DIR)
+    files = {f[:-len('.pkl')]: os.stat(os.path.join(MODEL_DIR, f)) for f in entries if f.endswith('.pkl')}
+    for entry in entries:
+        suffix = next((suffix for suffix in DERIVED_SUFFIXES if entry.endswith(suffix)), None)
+        if suffix is not None and entry[:-len(suffix)] not in files:
+            try:
+                os.remove(os.path.join(MODEL_DIR, entry))
+                logger.info(f"Удалён файл {entry} модели без pickle")
+            except OSError as e:
+                logger.warning(f"Не удалось удалить файл {entry} модели без pickle: {e}")
+    registered = {row["name"]: row["model_bytes"] for row in connection.execute("SELECT name, model_bytes FROM models")}
+
+    added = [name for name in files if name not in registered]
+    for name in added:
+        created_at = datetime.fromtimestamp(files[name].st_mtime)
+        connection.execute(
+            "INSERT OR IGNORE INTO models (name, created_at, model_bytes, artifact_bytes) VALUES (?, ?, ?, ?)",
+            (name, created_at.isoformat(), files[name].st_size, _artifact_bytes(name)),
+        )
+        try:
+            with open(os.path.join(MODEL_DIR, name, "metrics.json"), 'r', encoding='utf-8') as f:
+                _write_metrics(connection, name, json.load(f))
+        except (OSError, ValueError):
+            pass
+
+    removed = [name for name in registered if name not in files]
+    for name in removed:
+        connection.execute("DELETE FROM models WHERE name = ?", (name,))
+        connection.execute("DELETE FROM model_metrics WHERE name = ?", (name,))
+
+    for name, model_bytes in registered.items():
+        if name in files and model_bytes != files[name].st_size:
+            connection.execute(
+                "UPDATE models SET model_bytes = ?, artifact_bytes = ? WHERE name = ?",
+                (files[name].st_size, _artifact_bytes(name), name),
+            )
+    connection.commit()
+    if added or removed:
+        logger.info(f"Реестр моделей сверен с файлами: добавлено {len(added)}, удалено {len(removed)}")
+
+
+def register_model(name: str, model):
+    """
+    Добавляет или обновляет запись о модели при её сохранении.
+
+    name: имя модели
+    model: объект модели; параметры берутся из get_params, если он есть
+    """
+    params = model.get_params() if hasattr(model, "get_params") else {}
+    try:
+        _upsert_model(name, model, params)
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при записи модели {name} в реестр: {e}")
+
+
+def _upsert_model(name: str, model, params: dict):
+    with _transaction() as connection:
+        connection.execute(
+            """
+            INSERT INTO models (name, created_at, model_type, params, model_bytes, artifact_bytes)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+                model_type = excluded.model_type,
+                params = excluded.params,
+                model_bytes = excluded.model_bytes,
+                artifact_bytes = excluded.artifact_bytes
+            """,
+            (
+                name, datetime.now().isoformat(), model.__class__.__name__,
+                json.dumps(params, ensure_ascii=False, default=str), _model_bytes(name), _artifact_bytes(name),
+            ),
+        )
+
+
+def register_metrics(name: str, metrics: dict):
+    """
+    Сохраняет метрики модели в реестре; числовые метрики индексируются для сортировки.
+
+    name: имя модели
+    metrics: словарь метрик
+    """
+    try:
+        with _transaction() as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO models (name, created_at) VALUES (?, ?)",
+                (name, datetime.now().isoformat()),
+            )
+            _write_metrics(connection, name, metrics)
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при записи метрик модели {name} в реестр: {e}")
+
+
+def refresh_artifacts(name: str):
+    """
+    Пересчитывает размер артефактов модели (вызывается после записи новых файлов).
+    """
+    try:
+        with _transaction() as connection:
+            connection.execute(
+                "UPDATE models SET artifact_bytes = ? WHERE name = ?", (_artifact_bytes(name), name)
+            )
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка при обновлении размера артефактов модели {name} в реестре: {e}")
+
+
+def query_models(limit: int = None, offset: int = 0, sort_by: str = "created_at", descending: bool = True,
+                 name_prefix: str = None, created_after: str = None, created_before: str = None,
+                 min_value: float = None, include_total: bool = False) -> dict:
+    """
+    Возвращает страницу записей реестра.
+
+    limit, offset: размер и смещение страницы (limit=None - все записи)
+    sort_by: 'created_at', 'name' или имя метрики (например, 'f1_test')
+    descending: порядок сортировки
+    name_prefix: отбор по началу имени модели
+    created_after, created_before: отбор по дате создания (ISO 8601)
+    min_value: минимальное значение метрики sort_by (только при сортировке по метрике)
+    include_total: подсчитать общее количество записей (отдельный запрос COUNT(*)
+    по всей выборке, поэтому выполняется только по запросу; иначе total = None)
+    Сортировка по метрике использует индекс (metric, value); модели без этой метрики
+    в выдачу не попадают. Возвращает словарь с общим количеством и записями страницы
+    """
+    direction = "DESC" if descending else "ASC"
+    where, args = [], []
+    if name_prefix:
+        where.append("m.name LIKE ? ESCAPE '\\'")
+        args.append(name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+    if created_after:
+        where.append("m.created_at >= ?")
+        args.append(created_after)
+    if created_before:
+        where.append("m.created_at < ?")
+        args.append(created_before)
+
+    if sort_by in ("created_at", "name"):
+        source = "models m"
+        order = f"m.{sort_by} {direction}"
+    else:
+        source = "model_metrics mm JOIN models m ON m.name = mm.name"
+        where.insert(0, "mm.metric = ?")
+        args.insert(0, sort_by)
+        if min_value is not None:
+            where.append("mm.value >= ?")
+            args.append(min_value)
+        order = f"mm.value {direction}, m.name"
+
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    page_sql = "LIMIT ? OFFSET ?" if limit is not None else "LIMIT -1 OFFSET ?"
+    page_args = [limit, offset] if limit is not None else [offset]
+
+    with _transaction() as connection:
+        total = None
+        if include_total:
+            total = connection.execute(f"SELECT COUNT(*) FROM {source} {where_sql}", args).fetchone()[0]
+        rows = connection.execute(
+            f"SELECT m.* FROM {source} {where_sql} ORDER BY {order} {page_sql}", args + page_args
+        ).fetchall()
+
+    items = [
+        {
+            "name": row["name"],
+            "created_at": row["created_at"],
+            "model_type": row["model_type"],
+            "params": json.loads(row["params"]) if row["params"] else None,
+            "metrics": json.loads(row["metrics"]) if row["metrics"] else None,
+            "model_bytes": row["model_bytes"],
+            "artifact_bytes": row["artifact_bytes"],
+        }
+        for row in rows
+    ]
+    return {"total": total, "limit": limit, "offset": offset, "items": items}
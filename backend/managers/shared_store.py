@@ -0,0 +1,132 @@
+import os
+import json
+import mmap
+import pickle
+import struct
+import logging
+
+from config import MODEL_DIR
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+SHARED_SUFFIX = ".shared"
+# Словари кодирования модели (таблицы поиска из encoders.json)
+ENCODERS_SHARED_SUFFIX = ".encoders.shared"
+SHARED_MAGIC = b"MDLSHR01"
+SHARED_VERSION = 1
+# Выравнивание массивов в файле (байт)
+SHARED_ALIGNMENT = 64
+
+
+def shared_path(model_name: str, suffix: str = SHARED_SUFFIX) -> str:
+    return os.path.join(MODEL_DIR, f"{model_name}{suffix}")
+
+
+def _source_stamp(stat) -> dict:
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _align(offset: int) -> int:
+    return (offset + SHARED_ALIGNMENT - 1) // SHARED_ALIGNMENT * SHARED_ALIGNMENT
+
+
+def materialize_model(model, model_name: str, source_stat, suffix: str = SHARED_SUFFIX) -> str:
+    """
+    Сохраняет модель в файл, который процессы отображают в память только для чтения.
+
+    model: загруженная модель или её словари кодирования
+    model_name: имя модели
+    source_stat: os.stat исходного файла (.pkl или encoders.json); файл хранилища
+    считается устаревшим, если исходный файл изменился
+    suffix: SHARED_SUFFIX для модели, ENCODERS_SHARED_SUFFIX для словарей кодирования
+    Массивы NumPy внутри модели записываются вне потока pickle (протокол 5) и при
+    загрузке ссылаются на страницы отображённого файла, общие для всех процессов.
+    Возвращает путь к файлу
+    """
+    buffers = []
+    payload = pickle.dumps(model, protocol=5, buffer_callback=buffers.append)
+    raw_buffers = [buffer.raw() for buffer in buffers]
+
+    layout = []
+    offset = len(payload)
+    for raw in raw_buffers:
+        offset = _align(offset)
+        layout.append([offset, raw.nbytes])
+        offset += raw.nbytes
+    header = json.dumps({
+        "version": SHARED_VERSION,
+        "source": _source_stamp(source_stat),
+        "payload_size": len(payload),
+        "buffers": layout,
+    }).encode("utf-8")
+    data_start = _align(len(SHARED_MAGIC) + 8 + len(header))
+
+    path = shared_path(model_name, suffix)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(SHARED_MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            f.seek(data_start)
+            f.write(payload)
+            for (buffer_offset, _), raw in zip(layout, raw_buffers):
+                f.seek(data_start + buffer_offset)
+                f.write(raw)
+        # Замена атомарна: процессы, уже отобразившие старый файл, продолжают работать с ним
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    logger.info(f"Модель {model_name} размещена в общем хранилище {path}")
+    return path
+
+
+def load_shared_model(model_name: str, source_stat, suffix: str = SHARED_SUFFIX):
+    """
+    Загружает модель из общего хранилища без копирования массивов.
+
+    source_stat: os.stat текущего исходного файла (.pkl или encoders.json)
+    suffix: см. materialize_model
+    Возвращает модель или None, если файла нет, он относится к другой версии исходного
+    файла или повреждён (в последних случаях вызывающий код пересоздаёт файл)
+    """
+    path = shared_path(model_name, suffix)
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        return None
+
+    view = memoryview(mapped)
+    try:
+        if bytes(view[:len(SHARED_MAGIC)]) != SHARED_MAGIC:
+            raise ValueError("неверная сигнатура")
+        header_size = struct.unpack_from("<Q", mapped, len(SHARED_MAGIC))[0]
+        header_start = len(SHARED_MAGIC) + 8
+        header = json.loads(bytes(view[header_start:header_start + header_size]))
+        if header["version"] != SHARED_VERSION or header["source"] != _source_stamp(source_stat):
+            return None
+
+        data_start = _align(header_start + header_size)
+        payload = view[data_start:data_start + header["payload_size"]]
+        buffers = [view[data_start + offset:data_start + offset + size] for offset, size in header["buffers"]]
+        # Массивы модели ссылаются на отображение, поэтому оно остаётся открытым, пока жива модель
+        return pickle.loads(payload, buffers=buffers)
+    except Exception as e:
+        logger.warning(f"Файл общего хранилища {path} повреждён и будет пересоздан: {e}")
+        return None
+
+
+def remove_shared_model(model_name: str, suffix: str = SHARED_SUFFIX):
+    """
+    Удаляет модель из общего хранилища (при переобучении или удалении модели).
+    Процессы, уже отобразившие файл, продолжают работать со своей копией до перезагрузки модели
+    """
+    try:
+        os.unlink(shared_path(model_name, suffix))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,358 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+
+class _Buckets:
+    """
+    Счётчики корзин скетча с целочисленными индексами; массив расширяется по мере
+    появления новых индексов.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def add(self, index: np.ndarray):
+        if index.size == 0:
+            return
+        low, high = int(index.min()), int(index.max())
+        self._extend(low, high)
+        self.counts += np.bincount(index - self.offset, minlength=self.counts.size)
+
+    def merge(self, other: "_Buckets"):
+        if other.counts.size == 0:
+            return
+        self._extend(other.offset, other.offset + other.counts.size - 1)
+        start = other.offset - self.offset
+        self.counts[start:start + other.counts.size] += other.counts
+
+    def _extend(self, low: int, high: int):
+        if self.counts.size == 0:
+            self.offset, self.counts = low, np.zeros(high - low + 1, dtype=np.int64)
+            return
+        new_low = min(low, self.offset)
+        new_high = max(high, self.offset + self.counts.size - 1)
+        if new_low == self.offset and new_high == self.offset + self.counts.size - 1:
+            return
+        counts = np.zeros(new_high - new_low + 1, dtype=np.int64)
+        counts[self.offset - new_low:self.offset - new_low + self.counts.size] = self.counts
+        self.offset, self.counts = new_low, counts
+
+    def nonzero(self):
+        index = np.flatnonzero(self.counts)
+        return index + self.offset, self.counts[index]
+
+
+class QuantileSketch:
+    """
+    Объединяемый скетч распределения с относительной точностью (по схеме DDSketch).
+
+    relative_accuracy: относительная погрешность квантилей
+    min_value: значения по модулю меньше min_value считаются нулём
+    Значение x попадает в корзину ceil(log_gamma(|x|)); число корзин растёт
+    логарифмически с диапазоном значений, а не с числом строк.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, min_value: float = 1e-9):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.min_value = min_value
+        self.positive = _Buckets()
+        self.negative = _Buckets()
+        self.zero_count = 0
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _index(self, magnitudes: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+
+    def add(self, values: np.ndarray):
+        """
+        values: конечные значения (без NaN и бесконечностей)
+        """
+        if values.size == 0:
+            return
+        self.count += int(values.size)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > self.min_value]
+        negative = values[values < -self.min_value]
+        self.zero_count += int(values.size - positive.size - negative.size)
+        self.positive.add(self._index(positive))
+        self.negative.add(self._index(-negative))
+
+    def merge(self, other: "QuantileSketch"):
+        self.positive.merge(other.positive)
+        self.negative.merge(other.negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _points(self):
+        """
+        Возвращает представителей корзин по возрастанию и количества значений в них.
+        """
+        negative_index, negative_counts = self.negative.nonzero()
+        positive_index, positive_counts = self.positive.nonzero()
+        scale = 2.0 / (self.gamma + 1)
+        values = np.concatenate([
+            -scale * self.gamma ** negative_index[::-1].astype(np.float64),
+            np.zeros(1 if self.zero_count else 0),
+            scale * self.gamma ** positive_index.astype(np.float64),
+        ])
+        counts = np.concatenate([
+            negative_counts[::-1], np.array([self.zero_count] if self.zero_count else [], dtype=np.int64),
+            positive_counts,
+        ])
+        return np.clip(values, self.min, self.max), counts
+
+    def quantiles(self, q) -> list:
+        """
+        Возвращает приближённые квантили уровней q (как np.percentile(..., q * 100)).
+        """
+        if self.count == 0:
+            return [None] * len(q)
+        values, counts = self._points()
+        ranks = np.asarray(q, dtype=np.float64) * (self.count - 1)
+        positions = np.searchsorted(np.cumsum(counts), ranks, side='right')
+        return values[np.minimum(positions, values.size - 1)].tolist()
+
+
+class StreamingHistogram:
+    """
+    Гистограмма с фиксированным числом равных интервалов, диапазон которой
+    расширяется по мере поступления значений.
+
+    n_bins: число интервалов (чётное); при выходе значения за диапазон ширина
+    интервалов удваивается, а соседние интервалы объединяются попарно, поэтому
+    диапазон превышает разброс данных не более чем в четыре раза
+    """
+
+    def __init__(self, n_bins: int = 8192):
+        self.n_bins = n_bins + n_bins % 2
+        self.low = None
+        self.width = None
+        self.counts = np.zeros(self.n_bins, dtype=np.int64)
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _expand(self, down: bool):
+        half = self.n_bins // 2
+        pairs = self.counts.reshape(half, 2).sum(axis=1)
+        self.counts = np.zeros(self.n_bins, dtype=np.int64)
+        if down:
+            self.counts[half:] = pairs
+            self.low -= self.n_bins * self.width
+        else:
+            self.counts[:half] = pairs
+        self.width *= 2
+
+    def add(self, values: np.ndarray):
+        """
+        values: конечные значения (без NaN и бесконечностей)
+        """
+        if values.size == 0:
+            return
+        low, high = float(values.min()), float(values.max())
+        self.min, self.max = min(self.min, low), max(self.max, high)
+        if self.low is None:
+            self.low = low
+            self.width = (high - low) / self.n_bins or max(abs(low), 1.0) * 1e-9
+        while low < self.low:
+            self._expand(down=True)
+        while high > self.low + self.n_bins * self.width:
+            self._expand(down=False)
+        index = np.minimum(((values - self.low) / self.width).astype(np.int64), self.n_bins - 1)
+        self.counts += np.bincount(index, minlength=self.n_bins)
+
+    def histogram(self, bins: int):
+        """
+        Возвращает гистограмму (counts, bin_edges) на отрезке [min, max], как
+        np.histogram(values, bins=bins); погрешность - не больше одного внутреннего
+        интервала на каждой границе
+        """
+        if self.low is None:
+            return np.zeros(bins, dtype=np.int64), np.linspace(0.0, 1.0, bins + 1)
+        centers = np.clip(self.low + (np.arange(self.n_bins) + 0.5) * self.width, self.min, self.max)
+        counts, bin_edges = np.histogram(centers, bins=bins, range=(self.min, self.max), weights=self.counts)
+        return counts.astype(np.int64), bin_edges
+
+
+class ReservoirSample:
+    """
+    Равномерная случайная выборка строк фиксированного размера из потока (алгоритм R).
+
+    size: размер выборки
+    seed: начальное значение генератора случайных чисел
+    """
+
+    def __init__(self, size: int, seed: int = 0):
+        self.size = size
+        self.seen = 0
+        self.rows = None
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, rows: np.ndarray):
+        n = rows.shape[0]
+        if self.rows is None:
+            self.rows = np.empty((self.size,) + rows.shape[1:], dtype=rows.dtype)
+        fill = min(max(self.size - self.seen, 0), n)
+        self.rows[self.seen:self.seen + fill] = rows[:fill]
+        if fill < n:
+            # Строка с номером t заменяет случайный элемент выборки с вероятностью size / (t + 1)
+            positions = self._rng.integers(0, self.seen + np.arange(fill, n) + 1)
+            selected = np.flatnonzero(positions < self.size) + fill
+            slots = positions[selected - fill]
+            # Если в блоке несколько строк попали в один элемент, остаётся последняя
+            _, last = np.unique(slots[::-1], return_index=True)
+            keep = selected.size - 1 - last
+            self.rows[slots[keep]] = rows[selected[keep]]
+        self.seen += n
+
+    def sample(self):
+        """
+        Возвращает выборку (не больше size строк) или None, если строк ещё не было.
+        """
+        if self.rows is None:
+            return None
+        return self.rows[:min(self.seen, self.size)]
+
+
+class StreamingSummary:
+    """
+    Однопроходные статистики набора данных, читаемого блоками.
+
+    columns: числовые столбцы для статистик и корреляции
+    sample_size: размер случайной выборки строк для графиков (0 - без выборки)
+    relative_accuracy: относительная погрешность квантилей
+    seed: начальное значение генератора для выборки
+    Для числовых столбцов накапливаются количество, среднее и сумма квадратов
+    отклонений (объединение по Чану), минимум и максимум, скетч квантилей и
+    гистограмма с расширяемым диапазоном, а для
+    пар столбцов - суммы и совместные моменты по парно полным строкам (корреляция
+    совпадает с DataFrame.corr). Для всех столбцов считаются пропуски.
+    Память не зависит от числа строк.
+    """
+
+    def __init__(self, columns: list, sample_size: int = 0, relative_accuracy: float = 0.01, seed: int = 0):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.rows = 0
+        self.missing = {}
+        self.count = np.zeros(k, dtype=np.int64)
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros(k)
+        self.sketches = [QuantileSketch(relative_accuracy) for _ in range(k)]
+        self.histograms = [StreamingHistogram() for _ in range(k)]
+        self.sample = ReservoirSample(sample_size, seed) if sample_size > 0 else None
+        # Сдвиг значений перед накоплением сумм уменьшает потерю точности при больших средних
+        self._shift = None
+        self._pair_count = np.zeros((k, k))
+        self._pair_sum = np.zeros((k, k))
+        self._pair_sum_sq = np.zeros((k, k))
+        self._pair_product = np.zeros((k, k))
+
+    def _numeric_values(self, chunk: pd.DataFrame) -> np.ndarray:
+        frame = chunk[self.columns]
+        non_numeric = [col for col in self.columns if not pd.api.types.is_numeric_dtype(frame[col])]
+        if non_numeric:
+            # В CSV тип столбца определяется по каждому блоку отдельно
+            frame = frame.assign(**{col: pd.to_numeric(frame[col], errors='coerce') for col in non_numeric})
+        values = frame.to_numpy(dtype=np.float64, na_value=np.nan)
+        values[~np.isfinite(values)] = np.nan
+        return values
+
+    def add(self, chunk: pd.DataFrame):
+        """
+        Учитывает очередной блок строк.
+        """
+        self.rows += len(chunk)
+        for col, count in chunk.isna().sum().items():
+            self.missing[col] = self.missing.get(col, 0) + int(count)
+        if not self.columns or chunk.empty:
+            return
+
+        values = self._numeric_values(chunk)
+        finite = np.isfinite(values)
+        count = finite.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, np.nansum(values, axis=0) / np.maximum(count, 1), 0.0)
+            m2 = np.nansum((values - mean) ** 2, axis=0)
+        total = self.count + count
+        delta = mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = np.where(total > 0, self.mean + delta * count / np.maximum(total, 1), 0.0)
+            self.m2 = self.m2 + m2 + np.where(total > 0, delta ** 2 * self.count * count / np.maximum(total, 1), 0.0)
+        self.count = total
+        for i, (sketch, histogram) in enumerate(zip(self.sketches, self.histograms)):
+            column = values[finite[:, i], i]
+            sketch.add(column)
+            histogram.add(column)
+
+        if self._shift is None:
+            self._shift = np.where(count > 0, mean, 0.0)
+        shifted = np.where(finite, values - self._shift, 0.0)
+        mask = finite.astype(np.float64)
+        self._pair_count += mask.T @ mask
+        self._pair_sum += shifted.T @ mask
+        self._pair_sum_sq += (shifted ** 2).T @ mask
+        self._pair_product += shifted.T @ shifted
+
+        if self.sample is not None:
+            self.sample.add(values)
+
+    def correlation(self) -> np.ndarray:
+        """
+        Матрица корреляции Пирсона по парно полным строкам (NaN, если пара не определена).
+        """
+        n = self._pair_count
+        sum_x, sum_y = self._pair_sum, self._pair_sum.T
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariance = n * self._pair_product - sum_x * sum_y
+            variance_x = n * self._pair_sum_sq - sum_x ** 2
+            variance_y = n * self._pair_sum_sq.T - sum_y ** 2
+            corr = covariance / np.sqrt(variance_x * variance_y)
+        corr[(n < 2) | (variance_x <= 0) | (variance_y <= 0)] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+    def describe(self, index: int, bins: int) -> dict:
+        """
+        Статистики и гистограмма столбца с номером index в формате describe_column.
+        Среднее, std, минимум и максимум точные; квантили и гистограмма приближённые.
+        """
+        count = int(self.count[index])
+        missing = self.rows - count
+        if count == 0:
+            return {"count": 0, "missing": missing, "histogram": {"bin_edges": [], "counts": []}}
+        sketch = self.sketches[index]
+        counts, bin_edges = self.histograms[index].histogram(bins)
+        q25, q50, q75 = sketch.quantiles([0.25, 0.5, 0.75])
+        return {
+            "count": count,
+            "missing": missing,
+            "mean": float(self.mean[index]),
+            "std": float(np.sqrt(self.m2[index] / (count - 1))) if count > 1 else None,
+            "min": sketch.min,
+            "q25": q25,
+            "median": q50,
+            "q75": q75,
+            "max": sketch.max,
+            "histogram": {"bin_edges": bin_edges.tolist(), "counts": counts.tolist()},
+        }
+
+    def sample_frame(self) -> pd.DataFrame:
+        """
+        Случайная выборка строк числовых столбцов (пустая, если выборка не ведётся).
+        """
+        rows = self.sample.sample() if self.sample is not None else None
+        if rows is None:
+            return pd.DataFrame(columns=self.columns, dtype=np.float64)
+        return pd.DataFrame(rows, columns=self.columns)
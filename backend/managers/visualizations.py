@@ -1,21 +1,133 @@
-import matplotlib.pyplot as plt
-import matplotlib
+import json
 import os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-from sklearn.model_selection import learning_curve
+import pandas as pd
 
-from config import MODEL_DIR
+from managers.registry import refresh_artifacts
+from config import (
+    MODEL_DIR, LEARNING_CURVE_MODE, LEARNING_CURVE_N_JOBS, LEARNING_CURVE_APPROX_CV,
+    LEARNING_CURVE_APPROX_SIZES, LEARNING_CURVE_MAX_SAMPLES
+)
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-matplotlib.use('TkAgg')
+LEARNING_CURVE_MODES = ("full", "approximate", "deferred", "off")
 
+# Параметры полного режима: 5 фолдов и 10 размеров выборки
+FULL_CV = 5
+FULL_SIZES = 10
 
-def save_learning_curve(X, y, model, model_name: str):
+# Отложенные кривые обучения считаются в фоновом потоке по одной, чтобы не блокировать
+# обработчики запросов; _pending - модели, для которых вычисление поставлено в очередь,
+# _failed - модели, для которых вычисление завершилось ошибкой (повторно не запускается)
+_deferred_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="learning_curve")
+_pending = set()
+_failed = set()
+_pending_lock = threading.Lock()
+
+
+def _model_path(model_name: str, filename: str) -> str:
+    return os.path.join(MODEL_DIR, model_name, filename)
+
+
+def _subsample(X, y, max_samples: int):
+    if len(X) <= max_samples:
+        return X, y
+    idx = np.sort(np.random.default_rng(42).choice(len(X), size=max_samples, replace=False))
+    return X.iloc[idx], y.iloc[idx]
+
+
+def compute_learning_curve(X, y, model, cv: int, n_sizes: int) -> dict:
+    """
+    Вычисляет значения кривой обучения без построения графика.
+
+    X: признаки для обучения
+    y: целевая переменная
+    model: модель, для которой строится кривая обучения
+    cv: количество фолдов кросс-валидации
+    n_sizes: количество размеров обучающей выборки
+    Возвращает словарь с размерами выборки и средними оценками
+    """
+    # sklearn и matplotlib импортируются при первом использовании, чтобы процессы,
+    # которые только выполняют предсказания, не тратили на них время запуска
+    from sklearn.model_selection import learning_curve
+
+    train_sizes, train_scores, test_scores = learning_curve(
+        model, X, y, cv=cv, n_jobs=LEARNING_CURVE_N_JOBS, train_sizes=np.linspace(0.1, 1.0, n_sizes)
+    )
+    return {
+        "train_sizes": train_sizes.tolist(),
+        "train_scores_mean": np.mean(train_scores, axis=1).tolist(),
+        "test_scores_mean": np.mean(test_scores, axis=1).tolist(),
+        "cv": cv,
+        "n_samples": len(X),
+    }
+
+
+def _replace_atomically(path: str, write):
+    """
+    Записывает файл через временный файл в том же каталоге и атомарно заменяет им path,
+    чтобы одновременные чтения (запросы изображения, проверка ETag) не видели
+    частично записанный файл.
+
+    write: функция write(tmp_path), создающая содержимое файла
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def render_learning_curve(model_name: str) -> str:
+    """
+    Строит PNG кривой обучения по сохранённым значениям learning_curve.json.
+
+    model_name: имя модели
+    Возвращает путь к PNG файлу
+    """
+    with open(_model_path(model_name, "learning_curve.json"), 'r', encoding='utf-8') as f:
+        curve = json.load(f)
+
+    from matplotlib.figure import Figure
+
+    # Figure без pyplot не зависит от интерактивного бэкенда и безопасна в потоках
+    fig = Figure()
+    ax = fig.subplots()
+    ax.plot(curve["train_sizes"], curve["train_scores_mean"], label="Train score", color="r")
+    ax.plot(curve["train_sizes"], curve["test_scores_mean"], label="Test score", color="g")
+    ax.set_xlabel("Training Set Size")
+    ax.set_ylabel("Score")
+    ax.set_title(f"Learning Curve for {model_name}")
+    ax.legend()
+
+    learning_curve_path = _model_path(model_name, "learning_curve.png")
+    _replace_atomically(learning_curve_path, lambda tmp_path: fig.savefig(tmp_path, format="png"))
+    refresh_artifacts(model_name)
+    logger.info(f"Кривая обучения для модели {model_name} построена в {learning_curve_path}")
+    return learning_curve_path
+
+
+def _save_curve(curve: dict, model_name: str):
+    os.makedirs(os.path.join(MODEL_DIR, model_name), exist_ok=True)
+
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(curve, f, indent=4)
+
+    _replace_atomically(_model_path(model_name, "learning_curve.json"), write)
+
+
+def save_learning_curve(X, y, model, model_name: str, mode: str = None):
     """
     Создает и сохраняет кривую обучения для заданной модели.
 
@@ -23,33 +135,102 @@ def save_learning_curve(X, y, model, model_name: str):
     y: целевая переменная
     model: модель, для которой строится кривая обучения
     model_name: имя модели, используемое для сохранения
+    mode: режим построения, по умолчанию LEARNING_CURVE_MODE:
+        'full' - 5 фолдов и 10 размеров выборки на всех данных;
+        'approximate' - меньше фолдов и размеров на подвыборке;
+        'deferred' - сохраняется подвыборка, кривая считается при первом запросе;
+        'off' - кривая не строится
+    Значения кривой сохраняются в learning_curve.json, PNG строится по ним
     """
+    mode = mode or LEARNING_CURVE_MODE
+    if mode not in LEARNING_CURVE_MODES:
+        raise RuntimeError(f"Неизвестный режим кривой обучения: {mode}")
     try:
-        # Получаем данные для кривой обучения
-        train_sizes, train_scores, test_scores = learning_curve(
-            model, X, y, cv=5, n_jobs=-1, train_sizes=np.linspace(0.1, 1.0, 10)
-        )
-
-        # Вычисляем средние значения для каждой из кривых
-        train_scores_mean = np.mean(train_scores, axis=1)
-        test_scores_mean = np.mean(test_scores, axis=1)
-
-        # Строим график
-        plt.figure()
-        plt.plot(train_sizes, train_scores_mean, label="Train score", color="r")
-        plt.plot(train_sizes, test_scores_mean, label="Test score", color="g")
-        plt.xlabel("Training Set Size")
-        plt.ylabel("Score")
-        plt.title(f"Learning Curve for {model_name}")
-        plt.legend()
-
-        # Сохраняем график
-        learning_curve_path = os.path.join(MODEL_DIR, model_name, "learning_curve.png")
-        os.makedirs(os.path.dirname(learning_curve_path), exist_ok=True)
-        plt.savefig(learning_curve_path)
-        plt.close()
+        if mode == "off":
+            logger.info(f"Кривая обучения для модели {model_name} отключена")
+            return
+        if mode == "deferred":
+            X_sample, y_sample = _subsample(X, y, LEARNING_CURVE_MAX_SAMPLES)
+            os.makedirs(os.path.join(MODEL_DIR, model_name), exist_ok=True)
+            np.savez(
+                _model_path(model_name, "learning_curve_data.npz"),
+                X=X_sample.to_numpy(), y=y_sample.to_numpy(), columns=np.array(X.columns, dtype=str)
+            )
+            logger.info(f"Данные для отложенной кривой обучения модели {model_name} сохранены")
+            return
+        if mode == "approximate":
+            X, y = _subsample(X, y, LEARNING_CURVE_MAX_SAMPLES)
+            curve = compute_learning_curve(X, y, model, LEARNING_CURVE_APPROX_CV, LEARNING_CURVE_APPROX_SIZES)
+        else:
+            curve = compute_learning_curve(X, y, model, FULL_CV, FULL_SIZES)
 
+        _save_curve(curve, model_name)
+        learning_curve_path = render_learning_curve(model_name)
         logger.info(f"Кривая обучения для модели {model_name} успешно сохранена в {learning_curve_path}")
     except Exception as e:
         logger.error(f"Ошибка при создании кривой обучения для модели {model_name}: {e}")
         raise RuntimeError(f"Ошибка при создании кривой обучения: {e}")
+
+
+def _compute_deferred(model_name: str, model_loader):
+    data_path = _model_path(model_name, "learning_curve_data.npz")
+    try:
+        with np.load(data_path) as data:
+            X = pd.DataFrame(data["X"], columns=list(data["columns"]))
+            y = data["y"]
+        curve = compute_learning_curve(X, y, model_loader(model_name), FULL_CV, FULL_SIZES)
+        _save_curve(curve, model_name)
+        os.remove(data_path)
+        render_learning_curve(model_name)
+    except Exception as e:
+        logger.error(f"Ошибка при отложенном построении кривой обучения для модели {model_name}: {e}")
+        with _pending_lock:
+            _failed.add(model_name)
+    finally:
+        with _pending_lock:
+            _pending.discard(model_name)
+
+
+def learning_curve_pending(model_name: str) -> bool:
+    """
+    Проверяет, ожидает ли модель отложенного построения кривой обучения.
+    """
+    return (
+        model_name not in _failed
+        and not os.path.exists(_model_path(model_name, "learning_curve.json"))
+        and os.path.exists(_model_path(model_name, "learning_curve_data.npz"))
+    )
+
+
+def ensure_learning_curve(model_name: str, model_loader=None):
+    """
+    Возвращает путь к PNG кривой обучения, при необходимости строя его.
+
+    model_name: имя модели
+    model_loader: функция, загружающая модель по имени (нужна для отложенного режима)
+    PNG перестраивается из learning_curve.json без переобучения. В отложенном режиме
+    вычисление по сохранённой подвыборке ставится в очередь фонового потока при первом
+    запросе, а до его завершения возвращается None (см. learning_curve_pending).
+    Возвращает None, если кривая для модели не строилась или ещё не готова
+    """
+    png_path = _model_path(model_name, "learning_curve.png")
+    if os.path.exists(png_path):
+        return png_path
+    if os.path.exists(_model_path(model_name, "learning_curve.json")):
+        return render_learning_curve(model_name)
+
+    if model_loader is None or not learning_curve_pending(model_name):
+        return None
+    with _pending_lock:
+        if model_name not in _pending:
+            _pending.add(model_name)
+            _deferred_executor.submit(_compute_deferred, model_name, model_loader)
+            logger.info(f"Отложенное построение кривой обучения для модели {model_name} поставлено в очередь")
+    return None
+
+
+def shutdown_learning_curves():
+    """
+    Отменяет ожидающие отложенные вычисления кривых обучения (текущее дорабатывает).
+    """
+    _deferred_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,11 +1,100 @@
-from sklearn.preprocessing import LabelEncoder
+import numpy as np
 import pandas as pd
 
+from config import PREPROCESSING_MODE
 
-def preprocess_data(df):
+# Версия предобработки; увеличивается при любом изменении результата preprocess_data,
+# чтобы не использовать устаревшие признаки из кэша
+PREPROCESSING_VERSION = 1
+
+# Категориальные признаки, кодируемые по словарю, полученному при обучении
+CATEGORICAL_FEATURES = ['category', 'gender', 'state']
+# Код для категорий, которые не встречались при обучении
+UNKNOWN_CATEGORY_CODE = -1
+
+# Столбцы, которые не используются моделью
+COLUMNS_TO_DROP = [
+    'Unnamed: 0', 'first', 'last', 'street', 'city', 'zip',
+    'trans_num', 'merch_zipcode', 'cc_num', 'merchant', 'job'
+]
+# Порог суммы транзакции, выше которого строки считаются выбросами
+OUTLIER_THRESHOLD = 2700
+
+# Явные форматы дат для быстрого режима (при несовпадении формат определяется автоматически)
+TRANS_DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+DOB_FORMAT = '%Y-%m-%d'
+
+# Компактные типы признаков REQUIRED_COLUMNS в быстром режиме
+COMPACT_DTYPES = {
+    'trans_year': np.int16, 'trans_month': np.int8, 'trans_day': np.int8,
+    'trans_hour': np.int8, 'trans_minute': np.int8, 'trans_second': np.int8,
+    'trans_weekday': np.int8, 'category': np.int16, 'amt': np.float32,
+    'gender': np.int16, 'state': np.int16, 'lat': np.float32, 'long': np.float32,
+    'city_pop': np.int32, 'merch_lat': np.float32, 'merch_long': np.float32,
+    'is_weekend': np.int8, 'is_night': np.int8, 'card_holder_age': np.int16,
+}
+
+
+def is_source_column(column):
+    """
+    Проверяет, нужен ли столбец исходных данных для предобработки.
+    Используется для чтения только нужных столбцов из файла
+    """
+    return column not in COLUMNS_TO_DROP
+
+
+def fit_encoders(df):
+    """
+    Строит словари кодирования категориальных признаков
+
+    df: DataFrame с исходными данными
+    Возвращает словарь {столбец: отсортированный список категорий};
+    код категории равен её позиции в списке, как у LabelEncoder
+    """
+    try:
+        return {col: sorted(df[col].dropna().unique().tolist()) for col in CATEGORICAL_FEATURES}
+    except Exception as e:
+        raise ValueError(f"Ошибка при построении словарей кодирования: {e}")
+
+
+def build_lookup_tables(encoders):
+    """
+    Преобразует словари кодирования в индексы для векторизованного поиска кодов
+
+    encoders: словарь {столбец: список категорий}
+    Возвращает словарь {столбец: pd.Index}
+    """
+    return {col: pd.Index(classes) for col, classes in encoders.items()}
+
+
+def preprocess_data(df, encoders=None, mode=None):
     """
     Функция для предобработки данных
     Принимает сырые данные и возвращает предобработанные данные
+
+    encoders: словари кодирования категориальных признаков (результат fit_encoders
+    или build_lookup_tables). Если не переданы, строятся по самим данным.
+    Категории, отсутствующие в словаре, получают код UNKNOWN_CATEGORY_CODE
+    mode: 'standard' или 'fast'; по умолчанию берётся из PREPROCESSING_MODE
+    """
+    mode = mode or PREPROCESSING_MODE
+    if mode == 'fast':
+        return _preprocess_data_fast(df, encoders)
+    if mode != 'standard':
+        raise ValueError(f"Неизвестный режим предобработки: {mode}")
+    return _preprocess_data_standard(df, encoders)
+
+
+def _get_lookup(encoders, col):
+    lookup = encoders[col]
+    if not isinstance(lookup, pd.Index):
+        lookup = pd.Index(lookup)
+    return lookup
+
+
+def _preprocess_data_standard(df, encoders=None):
+    """
+    Исходный режим предобработки: изменяет переданный DataFrame и сохраняет типы pandas
     """
     try:
         # Преобразование даты и времени
@@ -23,20 +112,16 @@ def preprocess_data(df):
 
     try:
         # Удаление ненужных столбцов
-        columns_to_drop = [
-            'Unnamed: 0', 'first', 'last', 'street', 'city', 'zip',
-            'trans_num', 'merch_zipcode', 'cc_num', 'merchant', 'job'
-        ]
-        df = df.drop(columns=columns_to_drop, errors='ignore')
+        df = df.drop(columns=COLUMNS_TO_DROP, errors='ignore')
     except Exception as e:
         raise ValueError(f"Ошибка при удалении столбцов: {e}")
 
     try:
         # Кодирование категориальных переменных
-        cat_features = ['category', 'gender', 'state']
-        for col in cat_features:
-            le = LabelEncoder()
-            df[col] = le.fit_transform(df[col])
+        if encoders is None:
+            encoders = fit_encoders(df)
+        for col in CATEGORICAL_FEATURES:
+            df[col] = _get_lookup(encoders, col).get_indexer(df[col])
     except Exception as e:
         raise ValueError(f"Ошибка при кодировании категориальных переменных: {e}")
 
@@ -63,9 +148,85 @@ def preprocess_data(df):
 
     try:
         # Удаление выбросов (опционально)
-        outlier_threshold = 2700
-        df = df[df['amt'] <= outlier_threshold]
+        df = df[df['amt'] <= OUTLIER_THRESHOLD]
     except Exception as e:
         raise ValueError(f"Ошибка при удалении выбросов: {e}")
 
     return df
+
+
+def _parse_datetime(values, fmt):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    try:
+        return pd.to_datetime(values, format=fmt)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values)
+
+
+def _to_compact(values, col):
+    values = np.asarray(values)
+    dtype = COMPACT_DTYPES.get(col)
+    # Пропуски не представимы в целочисленных типах, такие столбцы остаются как есть
+    if dtype is None or (np.issubdtype(dtype, np.integer) and pd.isna(values).any()):
+        return values
+    return values.astype(dtype, copy=False)
+
+
+def _preprocess_data_fast(df, encoders=None):
+    """
+    Быстрый режим предобработки: те же строки, столбцы и значения, что и в стандартном,
+    но признаки строятся векторно, входной DataFrame не изменяется, каждый столбец
+    копируется один раз (сразу с фильтром выбросов) и приводится к компактному типу
+    """
+    try:
+        trans_time = _parse_datetime(df['trans_date_trans_time'], TRANS_DATETIME_FORMAT)
+    except Exception as e:
+        raise ValueError(f"Ошибка при преобразовании даты и времени: {e}")
+
+    try:
+        dob = _parse_datetime(df['dob'], DOB_FORMAT)
+    except Exception as e:
+        raise ValueError(f"Ошибка при расчете возраста клиента: {e}")
+
+    try:
+        keep = (df['amt'] <= OUTLIER_THRESHOLD).to_numpy()
+    except Exception as e:
+        raise ValueError(f"Ошибка при удалении выбросов: {e}")
+
+    try:
+        # Словари строятся по всем строкам, как в стандартном режиме
+        if encoders is None:
+            encoders = fit_encoders(df)
+        lookups = {col: _get_lookup(encoders, col) for col in CATEGORICAL_FEATURES}
+    except Exception as e:
+        raise ValueError(f"Ошибка при кодировании категориальных переменных: {e}")
+
+    data = {}
+    for col in df.columns:
+        if col in COLUMNS_TO_DROP or col in ('trans_date_trans_time', 'dob'):
+            continue
+        values = df[col].to_numpy()[keep]
+        if col in lookups:
+            values = lookups[col].get_indexer(values)
+        data[col] = _to_compact(values, col)
+
+    try:
+        dt = trans_time[keep].dt
+        year = dt.year.to_numpy()
+        weekday = dt.weekday.to_numpy()
+        hour = dt.hour.to_numpy()
+        data['trans_year'] = _to_compact(year, 'trans_year')
+        data['trans_month'] = _to_compact(dt.month.to_numpy(), 'trans_month')
+        data['trans_day'] = _to_compact(dt.day.to_numpy(), 'trans_day')
+        data['trans_hour'] = _to_compact(hour, 'trans_hour')
+        data['trans_minute'] = _to_compact(dt.minute.to_numpy(), 'trans_minute')
+        data['trans_second'] = _to_compact(dt.second.to_numpy(), 'trans_second')
+        data['trans_weekday'] = _to_compact(weekday, 'trans_weekday')
+        data['is_weekend'] = (weekday >= 5).astype(np.int8)
+        data['is_night'] = ((hour < 6) | (hour >= 22)).astype(np.int8)
+        data['card_holder_age'] = _to_compact(year - dob[keep].dt.year.to_numpy(), 'card_holder_age')
+    except Exception as e:
+        raise ValueError(f"Ошибка при построении календарных признаков: {e}")
+
+    return pd.DataFrame(data, index=df.index[keep], copy=False)
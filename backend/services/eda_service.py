@@ -1,74 +1,389 @@
 import base64
 import io
+import os
 import logging
 
+import numpy as np
 import pandas as pd
-import seaborn as sns
-from matplotlib import pyplot as plt
+from starlette.datastructures import UploadFile
+
+from managers.data_loader import read_uploaded_file, read_data, detect_format, iter_data_chunks
+from managers.streaming_stats import StreamingSummary
+from managers.instrumentation import timed, ROWS_PROCESSED
+from config import (
+    EDA_HISTOGRAM_BINS, EDA_STREAMING_MIN_BYTES, EDA_CHUNK_SIZE, EDA_SAMPLE_SIZE, EDA_SKETCH_ACCURACY,
+    EDA_DISTRIBUTION_COLUMN
+)
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
-def get_plots(file):
+# Числовые столбцы-идентификаторы, распределение которых не несёт информации
+ID_LIKE_COLUMNS = {"cc_num", "zip", "unix_time"}
+
+
+def _is_id_like(column) -> bool:
+    name = str(column).lower()
+    return name.startswith("unnamed") or name in ID_LIKE_COLUMNS or name == "id" or name.endswith("_id")
+
+
+def _distribution_column(numeric_columns: list):
+    """
+    Выбирает столбец для графика распределения: EDA_DISTRIBUTION_COLUMN, если он есть,
+    иначе первый числовой столбец, не являющийся индексом или идентификатором.
+    """
+    if EDA_DISTRIBUTION_COLUMN in numeric_columns:
+        return EDA_DISTRIBUTION_COLUMN
+    candidates = [col for col in numeric_columns if not _is_id_like(col)]
+    return candidates[0] if candidates else numeric_columns[0]
+
+
+def _load_frame(file, content_type: str = None) -> pd.DataFrame:
+    with timed("eda_read"):
+        if isinstance(file, UploadFile):
+            df = read_uploaded_file(file)
+        else:
+            df = read_data(file, content_type=content_type)
+    ROWS_PROCESSED.inc("eda", value=len(df))
+    return df
+
+
+def _source_size(file):
+    """
+    Возвращает размер файла в байтах или None, если его нельзя узнать без чтения.
+    """
+    if isinstance(file, (str, os.PathLike)):
+        return os.path.getsize(file)
+    if isinstance(file, UploadFile):
+        return file.size
+    try:
+        position = file.tell()
+        size = file.seek(0, os.SEEK_END)
+        file.seek(position)
+        return size
+    except (AttributeError, OSError):
+        return None
+
+
+def use_streaming(file, streaming: bool = None) -> bool:
+    """
+    Определяет, обрабатывать ли файл потоково.
+
+    streaming: явный выбор; если не задан, потоково обрабатываются файлы
+    размером от EDA_STREAMING_MIN_BYTES
+    """
+    if streaming is not None:
+        return streaming
+    size = _source_size(file)
+    return size is not None and size >= EDA_STREAMING_MIN_BYTES
+
+
+def stream_statistics(file, content_type: str = None, sample_size: int = EDA_SAMPLE_SIZE,
+                      chunk_size: int = EDA_CHUNK_SIZE) -> StreamingSummary:
+    """
+    Читает файл блоками и накапливает однопроходные статистики (см. StreamingSummary).
+
+    file: путь к файлу, загруженный файл или бинарный объект файла (CSV, Parquet или Arrow IPC)
+    content_type: MIME-тип данных
+    sample_size: размер случайной выборки строк для графиков (0 - без выборки)
+    chunk_size: количество строк в блоке
+    Числовые столбцы определяются по первому блоку. Память ограничена размером
+    блока и выборки и не зависит от размера файла
+    """
+    source = file.file if isinstance(file, UploadFile) else file
+    with timed("eda_read"):
+        chunks = iter_data_chunks(source, chunk_size, detect_format(source, content_type))
+        first = next(chunks, None)
+        if first is None:
+            return StreamingSummary([])
+        summary = StreamingSummary(
+            first.select_dtypes(include="number").columns.tolist(), sample_size, EDA_SKETCH_ACCURACY
+        )
+        summary.add(first)
+        for chunk in chunks:
+            summary.add(chunk)
+    ROWS_PROCESSED.inc("eda", value=summary.rows)
+    logger.info(f"Потоковые статистики собраны: строк {summary.rows}, числовых столбцов {len(summary.columns)}")
+    return summary
+
+
+def _to_json_floats(values) -> list:
+    """
+    Преобразует массив в список float, заменяя NaN и бесконечности на None.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isfinite(values), values, None).tolist()
+
+
+def describe_column(values: np.ndarray, bins: int) -> dict:
+    """
+    Считает статистики и гистограмму одного числового столбца.
+
+    values: значения столбца в виде float64 (пропуски - NaN)
+    bins: количество интервалов гистограммы
+    """
+    finite = values[np.isfinite(values)]
+    if finite.size == 0:
+        return {"count": 0, "missing": int(values.size), "histogram": {"bin_edges": [], "counts": []}}
+
+    counts, bin_edges = np.histogram(finite, bins=bins)
+    q25, q50, q75 = np.percentile(finite, [25, 50, 75])
+    return {
+        "count": int(finite.size),
+        "missing": int(values.size - finite.size),
+        "mean": float(finite.mean()),
+        "std": float(finite.std(ddof=1)) if finite.size > 1 else None,
+        "min": float(finite.min()),
+        "q25": float(q25),
+        "median": float(q50),
+        "q75": float(q75),
+        "max": float(finite.max()),
+        "histogram": {"bin_edges": bin_edges.tolist(), "counts": counts.tolist()},
+    }
+
+
+def get_summary(file, content_type: str = None, bins: int = EDA_HISTOGRAM_BINS, streaming: bool = None):
     """
-    Генерирует графики на основе загруженного CSV файла.
+    Считает числовое описание данных для построения графиков на клиенте.
+
+    file: загруженный пользователем файл, путь к файлу или бинарный объект файла
+    (CSV, Parquet или Arrow IPC)
+    content_type: MIME-тип данных, если file не является загруженным файлом
+    bins: количество интервалов гистограмм
+    streaming: читать файл блоками (см. use_streaming); квантили и гистограммы
+    в этом режиме приближённые
+    Возвращает словарь с гистограммами и статистиками всех числовых столбцов,
+    количеством пропусков по всем столбцам и матрицей корреляции
+    """
+    if use_streaming(file, streaming):
+        return _get_streaming_summary(file, content_type, bins)
+
+    try:
+        df = _load_frame(file, content_type)
+        logger.info("Данные успешно загружены")
+    except Exception as e:
+        logger.error(f"Ошибка загрузки данных: {e}")
+        return {"error": f"Ошибка загрузки данных: {e}"}
 
-    file: файл в формате CSV, загружаемый пользователем
+    numeric_columns = [
+        col for col in df.select_dtypes(include="number").columns
+        if not str(col).lower().startswith("unnamed")
+    ]
+    summary = {
+        "rows": int(len(df)),
+        "missing": {str(col): int(count) for col, count in df.isna().sum().items()},
+        "columns": {},
+        "correlation": {"columns": [str(col) for col in numeric_columns], "matrix": []},
+    }
+    if not numeric_columns:
+        logger.warning("Нет числовых столбцов для анализа")
+        return summary
+
+    with timed("eda_summary"):
+        values = df[numeric_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        for i, col in enumerate(numeric_columns):
+            summary["columns"][str(col)] = describe_column(values[:, i], bins)
+
+        if len(numeric_columns) > 1:
+            if np.isfinite(values).all():
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    corr = np.corrcoef(values, rowvar=False)
+            else:
+                # При пропусках корреляция считается по парно полным строкам, как в pandas
+                corr = df[numeric_columns].corr().to_numpy()
+            summary["correlation"]["matrix"] = [_to_json_floats(row) for row in corr]
+    logger.info(f"Числовое описание построено для {len(numeric_columns)} столбцов")
+    return summary
+
+
+def _get_streaming_summary(file, content_type: str, bins: int):
+    try:
+        statistics = stream_statistics(file, content_type, sample_size=0)
+    except Exception as e:
+        logger.error(f"Ошибка загрузки данных: {e}")
+        return {"error": f"Ошибка загрузки данных: {e}"}
+
+    positions = [i for i, col in enumerate(statistics.columns) if not str(col).lower().startswith("unnamed")]
+    numeric_columns = [statistics.columns[i] for i in positions]
+    with timed("eda_summary"):
+        summary = {
+            "rows": statistics.rows,
+            "missing": {str(col): count for col, count in statistics.missing.items()},
+            "columns": {str(statistics.columns[i]): statistics.describe(i, bins) for i in positions},
+            "correlation": {"columns": [str(col) for col in numeric_columns], "matrix": []},
+            "streaming": True,
+        }
+        if len(positions) > 1:
+            corr = statistics.correlation()[np.ix_(positions, positions)]
+            summary["correlation"]["matrix"] = [_to_json_floats(row) for row in corr]
+    logger.info(f"Числовое описание построено потоково для {len(numeric_columns)} столбцов")
+    return summary
+
+
+def _plotting():
+    """
+    Импортирует pyplot и seaborn при первом построении графиков (вместе они
+    загружаются больше секунды) с неинтерактивным бэкендом Agg
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import pyplot as plt
+    import seaborn as sns
+    return plt, sns
+
+
+def _figure_to_base64(plt) -> str:
+    buf = io.BytesIO()
+    plt.savefig(buf, format="png", bbox_inches="tight")
+    buf.seek(0)
+    image = base64.b64encode(buf.read()).decode("utf-8")
+    plt.close()
+    return image
+
+
+def _render_distribution(plt, sns, column, title: str, **histplot_kwargs) -> str:
+    """
+    Строит гистограмму столбца; histplot_kwargs - данные для sns.histplot
+    """
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.histplot(
+        ax=ax,
+        color="skyblue",
+        edgecolor="black",
+        linewidth=1.5,
+        **histplot_kwargs,
+    )
+    ax.set_title(
+        title,
+        fontsize=16,
+        fontweight="bold",
+        color="darkblue",
+    )
+    ax.set_xlabel(
+        column,
+        fontsize=14,
+        fontweight="bold",
+    )
+    ax.set_ylabel(
+        "Частота",
+        fontsize=14,
+        fontweight="bold",
+    )
+    ax.grid(True, linestyle="--", alpha=0.7)
+    return _figure_to_base64(plt)
+
+
+def _render_correlation(plt, sns, corr: pd.DataFrame) -> str:
+    fig, ax = plt.subplots(figsize=(14, 10))
+    sns.heatmap(
+        corr,
+        annot=True,
+        fmt=".2f",
+        cmap="coolwarm",
+        annot_kws={"size": 10, "fontweight": "bold"},
+        cbar_kws={"shrink": 0.8, "aspect": 30},
+        linewidths=0.5,
+        square=True,
+        ax=ax,
+    )
+    ax.set_title(
+        "Матрица корреляции",
+        fontsize=18,
+        fontweight="bold",
+        color="darkblue",
+        pad=20,
+    )
+    ax.tick_params(axis="x", labelsize=12, rotation=45)
+    ax.tick_params(axis="y", labelsize=12)
+    return _figure_to_base64(plt)
+
+
+def _plot_data(file, content_type: str = None):
+    """
+    Загружает файл целиком и готовит данные для графиков.
+
+    Возвращает кортеж (числовые столбцы, функция, возвращающая (заголовок, аргументы
+    sns.histplot) для столбца, функция, возвращающая матрицу корреляции для столбцов)
+    """
+    df = _load_frame(file, content_type)
+    numeric_columns = list(df.select_dtypes(include=["float", "int"]).columns)
+
+    def distribution(column):
+        return f"Распределение: {column}", {"data": df[column], "kde": True}
+
+    def correlation(columns):
+        return df[columns].corr()
+
+    return numeric_columns, distribution, correlation
+
+
+def _streaming_plot_data(file, content_type: str = None):
+    """
+    То же, что _plot_data, но по однопроходным статистикам файла, читаемого блоками:
+    гистограмма строится по случайной выборке строк (с оценкой плотности), а без
+    выборки (EDA_SAMPLE_SIZE=0) - по накопленной гистограмме всех значений
+    """
+    statistics = stream_statistics(file, content_type)
+    sample = statistics.sample_frame()
+    correlation_matrix = pd.DataFrame(
+        statistics.correlation(), index=statistics.columns, columns=statistics.columns
+    )
+
+    def distribution(column):
+        if not sample.empty:
+            title = f"Распределение: {column} (выборка {len(sample)} из {statistics.rows} строк)"
+            return title, {"data": sample[column], "kde": True}
+        counts, bin_edges = statistics.histograms[statistics.columns.index(column)].histogram(EDA_HISTOGRAM_BINS)
+        centers = (bin_edges[:-1] + bin_edges[1:]) / 2
+        return f"Распределение: {column}", {
+            "x": centers, "weights": counts, "bins": len(counts), "binrange": (bin_edges[0], bin_edges[-1])
+        }
+
+    def correlation(columns):
+        return correlation_matrix.loc[columns, columns]
+
+    return statistics.columns, distribution, correlation
+
+
+def get_plots(file, content_type: str = None, streaming: bool = None):
+    """
+    Генерирует графики на основе загруженного файла.
+
+    file: загруженный пользователем файл, путь к файлу или бинарный объект файла
+    (CSV, Parquet или Arrow IPC)
+    content_type: MIME-тип данных, если file не является загруженным файлом
+    streaming: читать файл блоками (см. use_streaming)
     Возвращает словарь с графиками в формате base64
     """
     plots = {}
 
     try:
         # Загружаем данные
-        df = pd.read_csv(io.StringIO(str(file.file.read(), 'utf-8')))
+        if use_streaming(file, streaming):
+            numeric_columns, distribution, correlation = _streaming_plot_data(file, content_type)
+        else:
+            numeric_columns, distribution, correlation = _plot_data(file, content_type)
         logger.info("Данные успешно загружены")
     except Exception as e:
         logger.error(f"Ошибка загрузки данных: {e}")
         return {"error": f"Ошибка загрузки данных: {e}"}
 
+    plt, sns = _plotting()
+
     # Выбираем только числовые столбцы
-    numeric_columns = df.select_dtypes(include=["float", "int"]).columns
-    if numeric_columns.empty:
+    if not numeric_columns:
         logger.warning("Нет числовых столбцов для анализа")
         return {"plots": {}, "message": "Нет числовых столбцов для анализа"}
 
-    # График распределения для первого числового столбца
+    # График распределения для содержательного числового столбца (не индекса и не идентификатора)
     try:
-        if len(numeric_columns) > 0:
-            fig, ax = plt.subplots(figsize=(10, 6))
-            sns.histplot(
-                df['trans_month'],
-                kde=True,
-                ax=ax,
-                color="skyblue",
-                edgecolor="black",
-                linewidth=1.5,
-            )
-            ax.set_title(
-                f"Распределение: trans_month",
-                fontsize=16,
-                fontweight="bold",
-                color="darkblue",
-            )
-            ax.set_xlabel(
-                'Номер месяца',
-                fontsize=14,
-                fontweight="bold",
-            )
-            ax.set_ylabel(
-                "Частота",
-                fontsize=14,
-                fontweight="bold",
-            )
-            ax.grid(True, linestyle="--", alpha=0.7)
-            buf = io.BytesIO()
-            plt.savefig(buf, format="png", bbox_inches="tight")
-            buf.seek(0)
-            plots["distribution"] = base64.b64encode(buf.read()).decode("utf-8")
-            plt.close()
-            logger.info(f"График распределения для {numeric_columns[0]} успешно создан")
+        column = _distribution_column(numeric_columns)
+        title, histplot_kwargs = distribution(column)
+        with timed("eda_plot"):
+            plots["distribution"] = _render_distribution(plt, sns, column, title, **histplot_kwargs)
+        logger.info(f"График распределения для {column} успешно создан")
     except Exception as e:
         logger.error(f"Ошибка при создании графика распределения: {e}")
         return plots
@@ -78,33 +393,8 @@ def get_plots(file):
         if len(numeric_columns) > 1:
             relevant_columns = [col for col in numeric_columns if not col.lower().startswith("unnamed")]
             if relevant_columns:
-                fig, ax = plt.subplots(figsize=(14, 10))
-                corr = df[relevant_columns].corr()
-                sns.heatmap(
-                    corr,
-                    annot=True,
-                    fmt=".2f",
-                    cmap="coolwarm",
-                    annot_kws={"size": 10, "fontweight": "bold"},
-                    cbar_kws={"shrink": 0.8, "aspect": 30},
-                    linewidths=0.5,
-                    square=True,
-                    ax=ax,
-                )
-                ax.set_title(
-                    "Матрица корреляции",
-                    fontsize=18,
-                    fontweight="bold",
-                    color="darkblue",
-                    pad=20,
-                )
-                ax.tick_params(axis="x", labelsize=12, rotation=45)
-                ax.tick_params(axis="y", labelsize=12)
-                buf = io.BytesIO()
-                plt.savefig(buf, format="png", bbox_inches="tight")
-                buf.seek(0)
-                plots["correlation_matrix"] = base64.b64encode(buf.read()).decode("utf-8")
-                plt.close()
+                with timed("eda_plot"):
+                    plots["correlation_matrix"] = _render_correlation(plt, sns, correlation(relevant_columns))
                 logger.info("Матрица корреляции успешно создана")
     except Exception as e:
         logger.error(f"Ошибка при создании матрицы корреляции: {e}")
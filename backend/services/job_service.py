@@ -0,0 +1,172 @@
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from time import perf_counter
+
+from services.training_service import TRAINING_STAGES
+from managers.instrumentation import record_stage
+from config import TRAINING_MAX_CONCURRENT_JOBS, TRAINING_MAX_QUEUED_JOBS, TRAINING_JOB_HISTORY
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+JOB_STAGES = ["load"] + TRAINING_STAGES
+
+
+class JobQueueFullError(Exception):
+    """
+    Исключение для случаев, когда очередь задач обучения заполнена.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        super().__init__(f"Очередь задач обучения заполнена (не более {limit} задач)")
+
+
+class TrainingJobManager:
+    """
+    Выполняет обучение моделей в фоновых потоках, не блокируя обработку запросов.
+
+    max_concurrent: количество одновременно выполняемых задач
+    max_queued: количество задач, ожидающих запуска
+    history: количество завершённых задач, информация о которых хранится в памяти
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, history: int):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="training-job")
+        self._jobs = OrderedDict()
+        self._futures = {}
+        self._stage_started = {}
+        self._lock = threading.Lock()
+
+    def submit(self, task, model_params, cleanup=None) -> dict:
+        """
+        Ставит задачу обучения в очередь.
+
+        task: функция task(on_stage), выполняющая обучение и возвращающая имя модели
+        или словарь с ключом model_name (сохраняется в поле result задачи);
+        on_stage вызывается с именем этапа из JOB_STAGES при его начале
+        model_params: параметры модели (сохраняются в описании задачи)
+        cleanup: необязательная функция, вызываемая после завершения задачи
+        Возвращает описание задачи
+        Генерирует JobQueueFullError, если очередь заполнена
+        """
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
+            if active >= self.max_concurrent + self.max_queued:
+                raise JobQueueFullError(self.max_concurrent + self.max_queued)
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "stage": None,
+                "stages": {stage: "pending" for stage in JOB_STAGES},
+                "params": model_params.dict(),
+                "model_name": None,
+                "result": None,
+                "error": None,
+                "created_at": datetime.now().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            self._futures[job_id] = self._executor.submit(self._run, job_id, task, cleanup)
+            self._trim_history()
+            logger.info(f"Задача обучения {job_id} поставлена в очередь")
+            return self._snapshot(self._jobs[job_id])
+
+    def get(self, job_id: str):
+        """
+        Возвращает описание задачи или None, если задача не найдена.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return self._snapshot(job)
+
+    def list(self) -> list:
+        """
+        Возвращает описания всех задач, хранящихся в памяти, от новых к старым.
+        """
+        with self._lock:
+            return [self._snapshot(job) for job in reversed(self._jobs.values())]
+
+    def get_future(self, job_id: str):
+        """
+        Возвращает Future задачи (результат task) или None, если задача не найдена.
+        """
+        with self._lock:
+            return self._futures.get(job_id)
+
+    def shutdown(self):
+        """
+        Отменяет ожидающие задачи; выполняющиеся задачи дорабатывают в фоне.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _snapshot(job: dict) -> dict:
+        return {**job, "stages": dict(job["stages"])}
+
+    def _finish_stage(self, job_id: str, stage: str):
+        started = self._stage_started.pop(job_id, None)
+        if stage is not None and started is not None:
+            record_stage(f"train_{stage}", perf_counter() - started)
+
+    def _set_stage(self, job_id: str, stage: str):
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["stage"] is not None:
+                job["stages"][job["stage"]] = "done"
+            self._finish_stage(job_id, job["stage"])
+            self._stage_started[job_id] = perf_counter()
+            job["stage"] = stage
+            job["stages"][stage] = "running"
+
+    def _run(self, job_id: str, task, cleanup):
+        with self._lock:
+            self._jobs[job_id]["status"] = "running"
+            self._jobs[job_id]["started_at"] = datetime.now().isoformat()
+        try:
+            result = task(lambda stage: self._set_stage(job_id, stage))
+            model_name = result["model_name"] if isinstance(result, dict) else result
+            with self._lock:
+                job = self._jobs[job_id]
+                job["stages"][job["stage"]] = "done"
+                job["status"] = "completed"
+                job["model_name"] = model_name
+                job["result"] = result if isinstance(result, dict) else None
+            logger.info(f"Задача обучения {job_id} завершена, модель {model_name}")
+            return result
+        except Exception as e:
+            with self._lock:
+                job = self._jobs[job_id]
+                if job["stage"] is not None:
+                    job["stages"][job["stage"]] = "failed"
+                job["status"] = "failed"
+                job["error"] = str(e)
+            logger.error(f"Ошибка в задаче обучения {job_id}: {e}")
+            raise
+        finally:
+            with self._lock:
+                self._finish_stage(job_id, self._jobs[job_id]["stage"])
+                self._jobs[job_id]["finished_at"] = datetime.now().isoformat()
+            if cleanup is not None:
+                cleanup()
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("completed", "failed")]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+            self._futures.pop(job_id, None)
+
+
+training_jobs = TrainingJobManager(TRAINING_MAX_CONCURRENT_JOBS, TRAINING_MAX_QUEUED_JOBS, TRAINING_JOB_HISTORY)
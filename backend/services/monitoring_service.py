@@ -0,0 +1,27 @@
+import logging
+
+from managers.instrumentation import Counter, Gauge, MetricsMiddleware, render_metrics
+from managers.model_manager import get_cache_stats
+
+# Настройка логирования
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Кэш моделей читается через этот модуль, чтобы метрики описывали тот же экземпляр
+# model_manager, которым пользуются сервисы предсказаний
+Counter("model_cache_hits_total", "Попадания в кэш моделей", callback=lambda: get_cache_stats()["hits"])
+Counter("model_cache_misses_total", "Промахи кэша моделей", callback=lambda: get_cache_stats()["misses"])
+Counter("model_cache_evictions_total", "Вытеснения из кэша моделей", callback=lambda: get_cache_stats()["evictions"])
+Gauge("model_cache_bytes", "Объём моделей в кэше (по размеру файлов)", callback=lambda: get_cache_stats()["bytes"])
+
+
+def get_metrics() -> str:
+    """
+    Возвращает метрики сервиса в текстовом формате Prometheus
+
+    Метрики хранятся в модуле managers.instrumentation, общем для всех сервисов,
+    поэтому main обращается к ним только через этот сервис
+    """
+    return render_metrics()
@@ -1,72 +1,533 @@
 import base64
+import json
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
 
-from managers.model_manager import load_model, validate_required_columns
+import numpy as np
+import pandas as pd
+
+from managers.model_manager import (
+    load_model, load_encoders, validate_required_columns, preload_models, get_cache_stats
+)
 from managers.metrics import load_metrics
+from managers.instrumentation import timed, ROWS_PROCESSED
+from managers.visualizations import ensure_learning_curve, learning_curve_pending, shutdown_learning_curves
 
-from config import REQUIRED_COLUMNS, MODEL_DIR
-from preprocessing import preprocess_data
+from config import (
+    REQUIRED_COLUMNS, PREDICT_CHUNK_SIZE, PREDICT_COMPARE_MAX_MODELS, PREDICT_COMPARE_WORKERS,
+    PREDICT_COMPARE_PARALLEL_MIN_ROWS
+)
+from managers.data_loader import iter_data_chunks, read_data
+from preprocessing import (
+    preprocess_data, is_source_column, fit_encoders, build_lookup_tables, CATEGORICAL_FEATURES
+)
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
-def predict(model_name: str, df):
+# Форматы ответа /predict без потоковой передачи
+RESPONSE_MEDIA_TYPES = {
+    "json": "application/json",
+    "columns": "application/json",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+# Состав ответа: все признаки с предсказанием или только предсказание
+PREDICTION_FIELDS = ("all", "predictions")
+# Точность чисел с плавающей точкой в JSON (DataFrame.to_json по умолчанию округляет
+# до 10 значащих цифр; 15 - максимум, который поддерживает pandas)
+JSON_DOUBLE_PRECISION = 15
+
+
+def source_columns(id_column: str = None):
+    """
+    Возвращает функцию отбора столбцов исходных данных для чтения файла
+
+    id_column: столбец-идентификатор, который нужно прочитать дополнительно
+    (например, trans_num, удаляемый предобработкой)
+    """
+    if id_column is None:
+        return is_source_column
+    return lambda column: column == id_column or is_source_column(column)
+
+
+def _output_frame(df_processed, predictions, fields: str, ids=None):
+    """
+    Собирает таблицу ответа по предобработанным данным и предсказаниям
+
+    fields: 'all' - признаки и предсказание, 'predictions' - только предсказание
+    ids: Series идентификаторов исходных строк или None; добавляется первым столбцом
+    """
+    if fields == "predictions":
+        output = pd.DataFrame({"prediction": predictions}, index=df_processed.index)
+    else:
+        output = df_processed
+        output['prediction'] = predictions
+    if ids is not None and ids.name not in output.columns:
+        output.insert(0, ids.name, ids.loc[output.index].to_numpy())
+    return output
+
+
+def encode_predictions(output, output_format: str) -> bytes:
+    """
+    Сериализует таблицу предсказаний из массивов NumPy, минуя объекты Python для каждой строки
+
+    output: DataFrame с предсказаниями
+    output_format: 'json' - список объектов, 'columns' - объект {столбец: список значений},
+    'csv' или 'arrow' (Arrow IPC stream)
+    Возвращает тело ответа
+    """
+    if output_format == "json":
+        body = output.to_json(orient='records', force_ascii=False, double_precision=JSON_DOUBLE_PRECISION)
+    elif output_format == "columns":
+        columns = [
+            json.dumps(str(column), ensure_ascii=False) + ":"
+            + values.to_json(orient='records', force_ascii=False, double_precision=JSON_DOUBLE_PRECISION)
+            for column, values in output.items()
+        ]
+        body = "{" + ",".join(columns) + "}"
+    elif output_format == "csv":
+        body = output.to_csv(index=False)
+    elif output_format == "arrow":
+        import pyarrow
+        import pyarrow.ipc
+
+        table = pyarrow.Table.from_pandas(output, preserve_index=False)
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    else:
+        raise ValueError(f"Неподдерживаемый формат ответа: {output_format}")
+    return body.encode("utf-8")
+
+
+def predict_frame(model_name: str, df, fields: str = "all", id_column: str = None):
     """
     Выполняет предсказание на основе обученной модели
 
     model_name: имя модели для загрузки
     df: DataFrame с входными данными
-    Возвращает список предсказаний в формате словаря
+    fields: 'all' - признаки и предсказание, 'predictions' - только предсказание
+    id_column: столбец входных данных, копируемый в ответ для сопоставления строк
+    Возвращает DataFrame с предсказаниями; строки, отброшенные предобработкой как выбросы, в него не входят
     """
     try:
-        model = load_model(model_name)
+        if id_column is not None:
+            validate_required_columns(df, [id_column])
+            ids = df[id_column]
+        else:
+            ids = None
+
+        with timed("predict_load_model"):
+            model = load_model(model_name)
+            encoders = load_encoders(model_name)
         logger.info(f"Модель {model_name} успешно загружена")
 
-        df_processed = preprocess_data(df)
+        if encoders is None:
+            logger.warning(f"Словари кодирования для модели {model_name} не найдены, кодирование по входным данным")
+        with timed("predict_preprocess"):
+            df_processed = preprocess_data(df, encoders)
         logger.info("Данные успешно предобработаны")
 
         validate_required_columns(df_processed, REQUIRED_COLUMNS)
         logger.info("Все необходимые столбцы присутствуют в данных")
 
-        predictions = model.predict(df_processed[REQUIRED_COLUMNS])
+        with timed("predict_model"):
+            predictions = model.predict(df_processed[REQUIRED_COLUMNS])
+        ROWS_PROCESSED.inc("predict", value=len(df_processed))
         logger.info("Предсказания успешно выполнены")
 
-        df_processed['prediction'] = predictions
-        return df_processed.to_dict(orient='records')
+        return _output_frame(df_processed, predictions, fields, ids)
     except Exception as e:
         logger.error(f"Ошибка при выполнении предсказания для модели {model_name}: {e}")
         raise RuntimeError(f"Ошибка при выполнении предсказания: {e}")
 
 
-def get_model_info(model_name: str):
+def predict(model_name: str, df):
+    """
+    Выполняет предсказание на основе обученной модели
+
+    model_name: имя модели для загрузки
+    df: DataFrame с входными данными
+    Возвращает список предсказаний в формате словаря
+    """
+    output = predict_frame(model_name, df)
+    with timed("predict_serialize"):
+        return output.to_dict(orient='records')
+
+
+def _encoders_key(encoders) -> tuple:
+    return tuple((col, tuple(encoders[col])) for col in CATEGORICAL_FEATURES)
+
+
+def _recode_features(features, raw_categories: dict, encoders):
+    """
+    Возвращает копию матрицы признаков с категориальными столбцами, закодированными
+    по другим словарям; остальные признаки не пересчитываются
+    """
+    recoded = features.copy()
+    for col in CATEGORICAL_FEATURES:
+        codes = encoders[col].get_indexer(raw_categories[col].loc[features.index])
+        recoded[col] = codes.astype(features[col].dtype, copy=False)
+    return recoded
+
+
+def agreement_statistics(predictions: dict, champion: str) -> dict:
+    """
+    Считает распределение предсказаний каждой модели и их согласие с основной моделью
+
+    predictions: словарь {имя модели: массив предсказаний}
+    champion: имя основной модели
+    Для каждой модели-претендента возвращается доля и число совпадений с основной
+    моделью и таблица сопряжённости {класс основной модели: {класс претендента: количество}}
+    """
+    def counts(values):
+        classes, number = np.unique(values, return_counts=True)
+        return {str(cls): int(n) for cls, n in zip(classes.tolist(), number.tolist())}
+
+    reference = predictions[champion]
+    statistics = {
+        "rows": int(len(reference)),
+        "champion": champion,
+        "predicted": {name: counts(values) for name, values in predictions.items()},
+        "challengers": {},
+    }
+    for name, values in predictions.items():
+        if name == champion:
+            continue
+        agree = int(np.count_nonzero(values == reference))
+        crosstab = {}
+        for cls in np.unique(reference).tolist():
+            crosstab[str(cls)] = counts(values[reference == cls])
+        statistics["challengers"][name] = {
+            "agreement": agree / len(reference) if len(reference) else None,
+            "disagreements": int(len(reference) - agree),
+            "crosstab": crosstab,
+        }
+    return statistics
+
+
+def predict_models_frame(model_names: list, df, fields: str = "all", id_column: str = None):
+    """
+    Выполняет предсказание несколькими моделями по одним входным данным
+
+    model_names: имена моделей; первая считается основной, остальные - претендентами
+    df: DataFrame с входными данными
+    fields, id_column: состав ответа (см. predict_frame)
+    Данные читаются и предобрабатываются один раз, матрица REQUIRED_COLUMNS строится
+    один раз; для моделей с другими словарями кодирования перекодируются только
+    категориальные признаки. На больших данных модели выполняются в пуле потоков.
+    Возвращает кортеж (DataFrame со столбцом prediction_<модель> для каждой модели,
+    статистика согласия agreement_statistics)
+    """
+    if not model_names or len(model_names) > PREDICT_COMPARE_MAX_MODELS:
+        raise ValueError(f"Нужно от 1 до {PREDICT_COMPARE_MAX_MODELS} моделей")
+    if len(set(model_names)) != len(model_names):
+        raise ValueError("Имена моделей повторяются")
+    try:
+        if id_column is not None:
+            validate_required_columns(df, [id_column])
+            ids = df[id_column]
+        else:
+            ids = None
+        raw_categories = {col: df[col] for col in CATEGORICAL_FEATURES if col in df.columns}
+
+        with timed("predict_load_model"):
+            models = {name: load_model(name) for name in model_names}
+            encoders = {name: load_encoders(name) for name in model_names}
+        if any(value is None for value in encoders.values()):
+            # Модели без сохранённых словарей кодируют категории по самим входным данным
+            fitted = build_lookup_tables(fit_encoders(df))
+            encoders = {name: fitted if value is None else value for name, value in encoders.items()}
+        logger.info(f"Модели {', '.join(model_names)} успешно загружены")
+
+        champion = model_names[0]
+        with timed("predict_preprocess"):
+            df_processed = preprocess_data(df, encoders[champion])
+        validate_required_columns(df_processed, REQUIRED_COLUMNS)
+        base_features = df_processed[REQUIRED_COLUMNS]
+        features = {_encoders_key(encoders[champion]): base_features}
+        for name in model_names[1:]:
+            key = _encoders_key(encoders[name])
+            if key not in features:
+                features[key] = _recode_features(base_features, raw_categories, encoders[name])
+        logger.info(f"Данные предобработаны один раз для {len(model_names)} моделей")
+
+        def run(name):
+            return models[name].predict(features[_encoders_key(encoders[name])])
+
+        with timed("predict_model"):
+            workers = min(len(model_names), PREDICT_COMPARE_WORKERS)
+            if workers > 1 and len(df_processed) >= PREDICT_COMPARE_PARALLEL_MIN_ROWS:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="predict_compare") as pool:
+                    predictions = dict(zip(model_names, pool.map(run, model_names)))
+            else:
+                predictions = {name: run(name) for name in model_names}
+        ROWS_PROCESSED.inc("predict", value=len(df_processed) * len(model_names))
+
+        statistics = agreement_statistics({name: np.asarray(values) for name, values in predictions.items()}, champion)
+        output = df_processed[[]] if fields == "predictions" else df_processed
+        output = output.assign(**{f"prediction_{name}": values for name, values in predictions.items()})
+        if ids is not None and ids.name not in output.columns:
+            output.insert(0, ids.name, ids.loc[output.index].to_numpy())
+        return output, statistics
+    except Exception as e:
+        logger.error(f"Ошибка при выполнении предсказания моделями {', '.join(model_names)}: {e}")
+        raise RuntimeError(f"Ошибка при выполнении предсказания: {e}")
+
+
+def predict_file_models(
+    model_names: list,
+    source,
+    content_type: str = None,
+    output_format: str = "json",
+    fields: str = "all",
+    id_column: str = None
+):
+    """
+    Читает входные данные и выполняет предсказание несколькими моделями (см. predict_models_frame)
+
+    Возвращает кортеж (тело ответа, статистика согласия); для форматов JSON тело -
+    объект {"statistics": ..., "predictions": ...}, для csv и arrow - только таблица
+    """
+    with timed("predict_read"):
+        df = read_data(source, content_type=content_type, usecols=source_columns(id_column))
+    logger.info(f"Данные для предсказания успешно загружены для моделей {', '.join(model_names)}")
+    output, statistics = predict_models_frame(model_names, df, fields, id_column)
+    with timed("predict_serialize"):
+        body = encode_predictions(output, output_format)
+        if RESPONSE_MEDIA_TYPES[output_format] == "application/json":
+            body = b'{"statistics":' + json.dumps(statistics, ensure_ascii=False).encode("utf-8") \
+                + b',"predictions":' + body + b'}'
+    return body, statistics
+
+
+def predict_records(model_name: str, records: list) -> list:
+    """
+    Выполняет предсказание для небольшого набора транзакций, переданных в виде словарей
+
+    model_name: имя модели для загрузки
+    records: список словарей с исходными полями транзакций
+    Используется быстрый режим предобработки и сохранённые словари кодирования.
+    Возвращает список предсказаний в порядке records; для строк, отброшенных
+    предобработкой как выбросы, возвращается None
+    """
+    with timed("predict_load_model"):
+        model = load_model(model_name)
+        encoders = load_encoders(model_name)
+    if encoders is None:
+        # Без сохранённых словарей коды категорий зависели бы от состава пакета
+        raise RuntimeError(f"Для модели {model_name} нет словарей кодирования, предсказание по транзакциям невозможно")
+
+    with timed("predict_preprocess"):
+        df_processed = preprocess_data(pd.DataFrame.from_records(records), encoders, mode='fast')
+    validate_required_columns(df_processed, REQUIRED_COLUMNS)
+
+    predictions = [None] * len(records)
+    if not df_processed.empty:
+        with timed("predict_model"):
+            values = model.predict(df_processed[REQUIRED_COLUMNS]).tolist()
+        for position, prediction in zip(df_processed.index, values):
+            predictions[position] = prediction
+    ROWS_PROCESSED.inc("predict", value=len(records))
+    return predictions
+
+
+# Транзакция для пробного предсказания при прогреве; категориальные поля
+# заменяются первыми значениями из словарей кодирования модели
+WARMUP_TRANSACTION = {
+    "trans_date_trans_time": datetime(2020, 6, 1, 12, 0, 0),
+    "category": "",
+    "amt": 50.0,
+    "gender": "",
+    "state": "",
+    "lat": 40.0,
+    "long": -90.0,
+    "city_pop": 10000,
+    "dob": date(1980, 1, 1),
+    "merch_lat": 40.0,
+    "merch_long": -90.0,
+    "trans_num": None,
+}
+
+
+def warm_models(model_names: list):
+    """
+    Загружает модели в кэш и выполняет на каждой пробное предсказание,
+    чтобы первый запрос не платил за ленивую инициализацию предобработки и модели
+
+    model_names: список имён моделей
+    Ошибки прогрева не прерывают запуск и записываются в лог
+    """
+    preload_models(model_names)
+    for model_name in model_names:
+        try:
+            encoders = load_encoders(model_name)
+            if encoders is None:
+                logger.info(f"Модель {model_name} без словарей кодирования, пробное предсказание пропущено")
+                continue
+            record = dict(WARMUP_TRANSACTION)
+            for column, lookup in encoders.items():
+                if column in record and len(lookup):
+                    record[column] = lookup[0]
+            with timed("predict_warmup"):
+                predict_records(model_name, [record])
+            logger.info(f"Модель {model_name} прогрета пробным предсказанием")
+        except Exception as e:
+            logger.warning(f"Не удалось прогреть модель {model_name}: {e}")
+
+
+def predict_file(
+    model_name: str,
+    source,
+    content_type: str = None,
+    output_format: str = "json",
+    fields: str = "all",
+    id_column: str = None
+) -> bytes:
+    """
+    Читает входные данные и выполняет предсказание; удобно для запуска в пуле исполнителей
+
+    model_name: имя модели для загрузки
+    source: путь к файлу или бинарный объект файла (CSV, Parquet или Arrow IPC)
+    content_type: MIME-тип данных, переданный клиентом
+    output_format, fields, id_column: формат и состав ответа (см. encode_predictions и predict_frame)
+    Возвращает тело ответа в формате output_format
+    """
+    with timed("predict_read"):
+        df = read_data(source, content_type=content_type, usecols=source_columns(id_column))
+    logger.info(f"Данные для предсказания успешно загружены для модели {model_name}")
+    output = predict_frame(model_name, df, fields, id_column)
+    with timed("predict_serialize"):
+        return encode_predictions(output, output_format)
+
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def predict_stream(
+    model_name: str,
+    path: str,
+    output_format: str = "ndjson",
+    chunk_size: int = PREDICT_CHUNK_SIZE,
+    data_format: str = None,
+    fields: str = "all",
+    id_column: str = None
+):
+    """
+    Готовит потоковое предсказание по файлу, обрабатываемому блоками строк
+
+    model_name: имя модели для загрузки
+    path: путь к файлу с входными данными (CSV, Parquet или Arrow IPC)
+    output_format: 'ndjson' или 'csv'
+    chunk_size: количество строк в одном блоке
+    data_format: формат входных данных; если не задан, определяется по сигнатуре файла
+    fields, id_column: состав ответа (см. predict_frame)
+    Модель и словари кодирования загружаются сразу, чтобы ошибки проявились до начала ответа.
+    Возвращает генератор фрагментов ответа
+    """
+    if output_format not in STREAM_MEDIA_TYPES:
+        raise ValueError(f"Неподдерживаемый формат ответа: {output_format}")
+
+    with timed("predict_load_model"):
+        model = load_model(model_name)
+        encoders = load_encoders(model_name)
+    if encoders is None:
+        # Без сохранённых словарей коды категорий зависели бы от содержимого блока
+        raise RuntimeError(f"Для модели {model_name} нет словарей кодирования, потоковое предсказание невозможно")
+
+    def generate():
+        header = True
+        rows = 0
+        for chunk in iter_data_chunks(path, chunk_size, data_format, usecols=source_columns(id_column)):
+            if id_column is not None:
+                validate_required_columns(chunk, [id_column])
+            with timed("predict_preprocess"):
+                df_processed = preprocess_data(chunk, encoders)
+            if df_processed.empty:
+                continue
+            validate_required_columns(df_processed, REQUIRED_COLUMNS)
+            with timed("predict_model"):
+                predictions = model.predict(df_processed[REQUIRED_COLUMNS])
+            rows += len(df_processed)
+            ROWS_PROCESSED.inc("predict", value=len(df_processed))
+
+            with timed("predict_serialize"):
+                output = _output_frame(
+                    df_processed, predictions, fields, chunk[id_column] if id_column is not None else None
+                )
+                if output_format == "csv":
+                    body = output.to_csv(index=False, header=header)
+                    header = False
+                else:
+                    body = output.to_json(
+                        orient='records', lines=True, force_ascii=False, double_precision=JSON_DOUBLE_PRECISION
+                    )
+                    body = body if body.endswith("\n") else body + "\n"
+            yield body
+        logger.info(f"Потоковое предсказание для модели {model_name} завершено, строк: {rows}")
+
+    return generate()
+
+
+LEARNING_CURVE_URL = "/models/{model_name}/learning_curve.png?v={version}"
+
+
+def get_learning_curve(model_name: str):
+    """
+    Возвращает путь к PNG кривой обучения и его версию или None, если кривой нет
+    или она ещё строится (см. learning_curve_pending)
+
+    model_name: имя модели
+    Версия меняется при каждой перезаписи файла и используется как ETag и в URL
+    """
+    # Для отложенной кривой обучения нужна исходная модель sklearn, а не LinearScorer
+    learning_curve_path = ensure_learning_curve(model_name, lambda name: load_model(name, compact=False))
+    if learning_curve_path is None:
+        return None
+    stat = os.stat(learning_curve_path)
+    return learning_curve_path, f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def get_model_info(model_name: str, inline_image: bool = False):
     """
     Возвращает информацию о модели, включая метрики и кривую обучения
 
     model_name: имя модели для загрузки
-    Возвращает словарь с метриками и кривой обучения в формате base64
+    inline_image: добавить кривую обучения в формате base64
+    Возвращает словарь с метриками и URL кривой обучения; пока отложенная кривая
+    строится, URL равен None, а learning_curve_pending - True
     """
     try:
         metrics = load_metrics(model_name)
         logger.info(f"Метрики для модели {model_name} успешно загружены")
 
-        learning_curve_path = os.path.join(MODEL_DIR, model_name, "learning_curve.png")
+        info = {"metrics": metrics, "learning_curve_url": None, "learning_curve_pending": False}
+        learning_curve = get_learning_curve(model_name)
 
-        if os.path.exists(learning_curve_path):
-            with open(learning_curve_path, "rb") as img_file:
-                img_data = img_file.read()
-                img_base64 = base64.b64encode(img_data).decode('utf-8')
-            logger.info(f"Кривая обучения для модели {model_name} успешно загружена")
+        if learning_curve is not None:
+            learning_curve_path, version = learning_curve
+            info["learning_curve_url"] = LEARNING_CURVE_URL.format(model_name=model_name, version=version)
+            if inline_image:
+                with open(learning_curve_path, "rb") as img_file:
+                    info["learning_curve"] = base64.b64encode(img_file.read()).decode('utf-8')
+                logger.info(f"Кривая обучения для модели {model_name} успешно загружена")
         else:
-            img_base64 = None
-            logger.warning(f"Кривая обучения для модели {model_name} не найдена")
+            if inline_image:
+                info["learning_curve"] = None
+            info["learning_curve_pending"] = learning_curve_pending(model_name)
+            if not info["learning_curve_pending"]:
+                logger.warning(f"Кривая обучения для модели {model_name} не найдена")
 
-        return {
-            "metrics": metrics,
-            "learning_curve": img_base64
-        }
+        return info
     except Exception as e:
         logger.error(f"Ошибка при получении информации о модели {model_name}: {e}")
         raise RuntimeError(f"Ошибка при получении информации о модели: {e}")
@@ -1,40 +1,148 @@
+import copy
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
-from sklearn.linear_model import LogisticRegression
+import numpy as np
 
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
-
-from preprocessing import preprocess_data
-from managers.model_manager import save_model
-from managers.metrics import save_metrics
+from preprocessing import preprocess_data, fit_encoders, is_source_column, CATEGORICAL_FEATURES
+from managers.data_loader import read_data_file, iter_data_chunks
+from managers.feature_cache import feature_cache_key, get_cached_features, put_cached_features
+from managers.model_manager import save_model, save_encoders
+from managers.metrics import save_metrics, MetricsModel
+from managers.evaluation import (
+    ScoreHistogram, confusion_counts, evaluate_split, metric_names, metrics_from_confusion, score_model
+)
 from managers.visualizations import save_learning_curve
-from config import REQUIRED_COLUMNS, TARGET_COLUMN
+from managers.instrumentation import ROWS_PROCESSED
+from config import (
+    REQUIRED_COLUMNS, TARGET_COLUMN, FEATURE_CACHE_ENABLED, SWEEP_WORKERS, TRAINING_CHUNK_SIZE, TRAINING_STREAM_EPOCHS
+)
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
-def train_model(df, model_params):
+TRAINING_STAGES = ["preprocess", "fit", "metrics", "learning_curve"]
+
+
+def _no_stage(stage):
+    pass
+
+
+def prepare_features(df):
+    """
+    Строит словари кодирования и матрицу признаков по исходным данным.
+
+    df: DataFrame с исходными данными
+    Возвращает кортеж (X, y, encoders)
+    """
+    # Строим словари кодирования один раз и преобразуем данные
+    encoders = fit_encoders(df)
+    df_processed = preprocess_data(df, encoders)
+    logger.info("Данные успешно предобработаны")
+    return df_processed[REQUIRED_COLUMNS], df_processed[TARGET_COLUMN], encoders
+
+
+def train_model(df, model_params, on_stage=None):
     """
     Обучает модель логистической регрессии на предоставленных данных.
 
     df: DataFrame с исходными данными
     model_params: параметры модели, включая max_iter и C
+    on_stage: необязательная функция, вызываемая с именем этапа из TRAINING_STAGES
+    при его начале (используется для отслеживания прогресса фоновых задач)
     Возвращает имя сохранённой модели
     """
+    on_stage = on_stage or _no_stage
+    try:
+        on_stage("preprocess")
+        X, y, encoders = prepare_features(df)
+    except Exception as e:
+        logger.error(f"Ошибка при обучении модели: {e}")
+        raise RuntimeError(f"Ошибка при обучении модели: {e}")
+    return train_on_features(X, y, encoders, model_params, on_stage)
+
+
+def load_features(path: str, data_format: str = None, on_stage=None):
+    """
+    Загружает файл и строит признаки, используя кэш предобработанных признаков.
+
+    path: путь к файлу с исходными данными (CSV, Parquet или Arrow IPC)
+    data_format: формат данных; если не задан, определяется по сигнатуре файла
+    on_stage: функция отслеживания этапов, вызывается с этапами 'load' и 'preprocess'
+    Если файл с тем же содержимым уже обрабатывался, чтение и предобработка пропускаются.
+    Возвращает кортеж (X, y, encoders)
+    """
+    on_stage = on_stage or _no_stage
     try:
-        # Преобразуем данные
-        df_processed = preprocess_data(df)
-        logger.info("Данные успешно предобработаны")
+        on_stage("load")
+        key = feature_cache_key(path) if FEATURE_CACHE_ENABLED else None
+        cached = get_cached_features(key) if key else None
+        if cached is not None:
+            on_stage("preprocess")
+            X, y, encoders = cached
+            logger.info(f"Признаки для {path} взяты из кэша")
+        else:
+            df = read_data_file(path, data_format=data_format, usecols=is_source_column)
+            logger.info(f"Данные для обучения успешно загружены из {path}")
+            on_stage("preprocess")
+            X, y, encoders = prepare_features(df)
+            del df
+            if key:
+                put_cached_features(key, X, y, encoders)
+        return X, y, encoders
+    except Exception as e:
+        logger.error(f"Ошибка при загрузке данных для обучения: {e}")
+        raise RuntimeError(f"Ошибка при загрузке данных для обучения: {e}")
+
+
+def train_model_from_file(path: str, model_params, data_format: str = None, on_stage=None):
+    """
+    Обучает модель по файлу, используя кэш предобработанных признаков.
+
+    path: путь к файлу с исходными данными (CSV, Parquet или Arrow IPC)
+    model_params: параметры модели, включая max_iter и C
+    data_format: формат данных; если не задан, определяется по сигнатуре файла
+    on_stage: функция отслеживания этапов; дополнительно вызывается с этапом 'load'
+    Возвращает имя сохранённой модели
+    """
+    X, y, encoders = load_features(path, data_format, on_stage)
+    return train_on_features(X, y, encoders, model_params, on_stage)
 
-        X = df_processed[REQUIRED_COLUMNS]
-        y = df_processed[TARGET_COLUMN]
 
+def compute_metrics(model, X_train, y_train, X_test, y_test) -> dict:
+    """
+    Считает метрики качества модели на тренировочной и тестовой выборках.
+
+    Каждая выборка оценивается одним проходом predict_proba: accuracy, precision,
+    recall и f1 (взвешенные) считаются по матрице ошибок, ROC-AUC, PR-AUC и precision
+    при бюджетах тревог - по вероятностям (см. managers.evaluation)
+    """
+    return {**evaluate_split(model, X_train, y_train, "train"), **evaluate_split(model, X_test, y_test, "test")}
+
+
+def train_on_features(X, y, encoders, model_params, on_stage=None):
+    """
+    Обучает модель по готовой матрице признаков и сохраняет модель, метрики и кривую обучения.
+
+    X: матрица признаков REQUIRED_COLUMNS
+    y: целевая переменная
+    encoders: словари кодирования категориальных признаков
+    model_params: параметры модели, включая max_iter и C
+    on_stage: необязательная функция отслеживания этапов
+    Возвращает имя сохранённой модели
+    """
+    # sklearn импортируется при первом обучении, а не при запуске сервиса
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import train_test_split
+
+    on_stage = on_stage or _no_stage
+    try:
         # Разделяем данные на тренировочную и тестовую выборки
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        ROWS_PROCESSED.inc("train", value=len(X))
         logger.info("Данные успешно разделены на тренировочную и тестовую выборки")
 
         # Инициализируем модель
@@ -42,6 +150,7 @@ def train_model(df, model_params):
         logger.info(f"Инициализирована модель {model.__class__.__name__} с параметрами: {model_params}")
 
         # Обучаем модель
+        on_stage("fit")
         model.fit(X_train, y_train)
         logger.info(f"Модель {model.__class__.__name__} успешно обучена")
 
@@ -50,24 +159,18 @@ def train_model(df, model_params):
 
         # Сохраняем модель
         save_model(model, model_name)
+        save_encoders(encoders, model_name)
         logger.info(f"Модель сохранена с именем {model_name}")
 
         # Сохраняем метрики
-        metrics = {
-            "accuracy_train": accuracy_score(y_train, model.predict(X_train)),
-            "accuracy_test": accuracy_score(y_test, model.predict(X_test)),
-            "f1_train": f1_score(y_train, model.predict(X_train), average='weighted'),
-            "f1_test": f1_score(y_test, model.predict(X_test), average='weighted'),
-            "precision_train": precision_score(y_train, model.predict(X_train), average='weighted'),
-            "precision_test": precision_score(y_test, model.predict(X_test), average='weighted'),
-            "recall_train": recall_score(y_train, model.predict(X_train), average='weighted'),
-            "recall_test": recall_score(y_test, model.predict(X_test), average='weighted'),
-        }
-
-        save_metrics(metrics, model_name)
+        on_stage("metrics")
+        metrics = compute_metrics(model, X_train, y_train, X_test, y_test)
+
+        save_metrics(MetricsModel(metrics=metrics), model_name)
         logger.info(f"Метрики сохранены для модели {model_name}")
 
         # Сохраняем кривую обучения
+        on_stage("learning_curve")
         save_learning_curve(X_train, y_train, model, model_name)
         logger.info(f"Кривая обучения сохранена для модели {model_name}")
 
@@ -75,3 +178,261 @@ def train_model(df, model_params):
     except Exception as e:
         logger.error(f"Ошибка при обучении модели: {e}")
         raise RuntimeError(f"Ошибка при обучении модели: {e}")
+
+
+# Данные перебора, передаваемые в процессы пула один раз при их запуске
+_sweep_data = {}
+
+
+def _init_sweep_worker(X_train, y_train, X_test, y_test):
+    _sweep_data.update(X_train=X_train, y_train=y_train, X_test=X_test, y_test=y_test)
+
+
+def _fit_sweep_path(max_iter: int, C_values: list) -> list:
+    """
+    Обучает модели для одного max_iter вдоль возрастающих значений C.
+
+    Каждая следующая модель стартует с коэффициентов предыдущей (warm_start),
+    поэтому соседние значения C сходятся за меньшее число итераций.
+    Возвращает список (params, model, metrics)
+    """
+    X_train, y_train = _sweep_data["X_train"], _sweep_data["y_train"]
+    X_test, y_test = _sweep_data["X_test"], _sweep_data["y_test"]
+    from sklearn.linear_model import LogisticRegression
+
+    model = LogisticRegression(max_iter=max_iter, warm_start=True)
+    results = []
+    for C in sorted(C_values):
+        model.set_params(C=C)
+        model.fit(X_train, y_train)
+        fitted = copy.deepcopy(model).set_params(warm_start=False)
+        results.append(({"max_iter": max_iter, "C": C}, fitted, compute_metrics(fitted, X_train, y_train, X_test, y_test)))
+    return results
+
+
+def _sweep_tasks(grid: dict, workers: int) -> list:
+    """
+    Разбивает сетку на задачи: для каждого max_iter значения C делятся
+    на непрерывные отрезки, чтобы задач было примерно столько же, сколько процессов.
+    """
+    max_iters = sorted(set(grid["max_iter"]))
+    C_values = sorted(set(grid["C"]))
+    segments = max(1, min(len(C_values), -(-workers // len(max_iters))))
+    step = -(-len(C_values) // segments)
+    return [
+        (max_iter, C_values[i:i + step])
+        for max_iter in max_iters
+        for i in range(0, len(C_values), step)
+    ]
+
+
+def sweep_metric_names() -> list:
+    """
+    Возвращает имена метрик, по которым можно ранжировать кандидатов перебора.
+    """
+    return metric_names()
+
+
+def sweep_models(X, y, encoders, grid: dict, top_k: int = 1, metric: str = "f1_test", on_stage=None) -> dict:
+    """
+    Перебирает гиперпараметры на одном разбиении данных и сохраняет лучшие модели.
+
+    X: матрица признаков REQUIRED_COLUMNS
+    y: целевая переменная
+    encoders: словари кодирования категориальных признаков
+    grid: сетка параметров {"max_iter": [...], "C": [...]}
+    top_k: сколько лучших моделей сохранить
+    metric: метрика для ранжирования (по убыванию), например 'f1_test'; кандидаты,
+    у которых метрика не определена (None), ставятся в конец
+    on_stage: необязательная функция отслеживания этапов
+    Модели обучаются параллельно в пуле процессов. Возвращает словарь с именем лучшей
+    модели и ранжированным списком всех кандидатов
+    """
+    from sklearn.model_selection import train_test_split
+
+    on_stage = on_stage or _no_stage
+    try:
+        if not grid.get("max_iter") or not grid.get("C"):
+            raise ValueError("Сетка параметров должна содержать непустые списки max_iter и C")
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        ROWS_PROCESSED.inc("sweep", value=len(X))
+        logger.info("Данные успешно разделены на тренировочную и тестовую выборки")
+
+        on_stage("fit")
+        tasks = _sweep_tasks(grid, SWEEP_WORKERS)
+        with ProcessPoolExecutor(
+            max_workers=min(len(tasks), SWEEP_WORKERS),
+            initializer=_init_sweep_worker,
+            initargs=(X_train, y_train, X_test, y_test),
+        ) as pool:
+            futures = [pool.submit(_fit_sweep_path, max_iter, C_values) for max_iter, C_values in tasks]
+            candidates = [candidate for future in futures for candidate in future.result()]
+        logger.info(f"Обучено кандидатов: {len(candidates)}")
+
+        on_stage("metrics")
+        if metric not in candidates[0][2]:
+            raise ValueError(f"Неизвестная метрика для ранжирования: {metric}")
+        candidates.sort(key=lambda candidate: (candidate[2][metric] is None, -(candidate[2][metric] or 0.0)))
+
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        ranking = []
+        saved = []
+        for rank, (params, model, metrics) in enumerate(candidates, start=1):
+            entry = {"rank": rank, "params": params, "metrics": metrics, "model_name": None}
+            if rank <= top_k:
+                model_name = f"{model.__class__.__name__}_{timestamp}"
+                if top_k > 1:
+                    model_name = f"{model_name}_top{rank}"
+                save_model(model, model_name)
+                save_encoders(encoders, model_name)
+                save_metrics(MetricsModel(metrics=metrics), model_name)
+                entry["model_name"] = model_name
+                saved.append((model, model_name))
+            ranking.append(entry)
+        logger.info(f"Сохранены лучшие модели по {metric}: {[name for _, name in saved]}")
+
+        on_stage("learning_curve")
+        for model, model_name in saved:
+            save_learning_curve(X_train, y_train, model, model_name)
+
+        return {"model_name": saved[0][1], "metric": metric, "candidates": ranking}
+    except Exception as e:
+        logger.error(f"Ошибка при переборе гиперпараметров: {e}")
+        raise RuntimeError(f"Ошибка при переборе гиперпараметров: {e}")
+
+
+def sweep_from_file(path: str, grid: dict, top_k: int = 1, metric: str = "f1_test",
+                    data_format: str = None, on_stage=None) -> dict:
+    """
+    Загружает данные (с кэшем признаков) и выполняет sweep_models.
+
+    path: путь к файлу с исходными данными (CSV, Parquet или Arrow IPC)
+    Остальные параметры как у sweep_models
+    """
+    X, y, encoders = load_features(path, data_format, on_stage)
+    return sweep_models(X, y, encoders, grid, top_k, metric, on_stage)
+
+
+# Доля строк отложенной выборки и seed её выбора при потоковом обучении
+STREAM_TEST_SIZE = 0.2
+STREAM_SPLIT_SEED = 42
+
+
+def _stream_encoders(path: str, data_format: str, chunk_size: int) -> dict:
+    """
+    Строит словари кодирования за один проход, читая только категориальные столбцы.
+    Результат совпадает с fit_encoders по всему файлу
+    """
+    categories = {col: set() for col in CATEGORICAL_FEATURES}
+    for chunk in iter_data_chunks(path, chunk_size, data_format, usecols=lambda col: col in CATEGORICAL_FEATURES):
+        for col in CATEGORICAL_FEATURES:
+            categories[col].update(chunk[col].dropna().unique().tolist())
+    return {col: sorted(values) for col, values in categories.items()}
+
+
+def _stream_features(path: str, data_format: str, chunk_size: int, encoders: dict):
+    """
+    Читает и предобрабатывает файл блоками.
+
+    Возвращает генератор кортежей (номер блока, X, y, holdout), где holdout - маска строк
+    отложенной выборки; маска зависит только от номера блока и одинакова во всех проходах
+    """
+    chunks = iter_data_chunks(path, chunk_size, data_format, usecols=is_source_column)
+    for index, chunk in enumerate(chunks):
+        df = preprocess_data(chunk, encoders)
+        if df.empty:
+            continue
+        holdout = np.random.default_rng([STREAM_SPLIT_SEED, index]).random(len(df)) < STREAM_TEST_SIZE
+        yield index, df[REQUIRED_COLUMNS].to_numpy(dtype=np.float64), df[TARGET_COLUMN].to_numpy(), holdout
+
+
+def train_model_streaming(path: str, model_params, data_format: str = None, epochs: int = TRAINING_STREAM_EPOCHS,
+                          chunk_size: int = TRAINING_CHUNK_SIZE, on_stage=None):
+    """
+    Обучает линейный классификатор по файлу блоками, не загружая данные целиком в память.
+
+    path: путь к файлу с исходными данными (CSV, Parquet или Arrow IPC)
+    model_params: параметры модели; используется C (регуляризация как у LogisticRegression)
+    data_format: формат данных; если не задан, определяется по сигнатуре файла
+    epochs: количество проходов partial_fit по данным
+    chunk_size: количество строк в блоке; потребление памяти определяется им, а не размером файла
+    on_stage: необязательная функция отслеживания этапов
+    Проходы по файлу: словари кодирования ('load'), средние и дисперсии признаков
+    ('preprocess'), epochs проходов обучения ('fit') и подсчёт метрик ('metrics').
+    Отложенная выборка выбирается случайно внутри каждого блока; ROC-AUC и PR-AUC
+    считаются приближённо по гистограмме оценок (EVALUATION_SCORE_BINS). Масштабирование
+    признаков переносится в коэффициенты, поэтому модель принимает исходные признаки,
+    как и LogisticRegression. Кривая обучения не строится.
+    Возвращает имя сохранённой модели
+    """
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    on_stage = on_stage or _no_stage
+    try:
+        on_stage("load")
+        encoders = _stream_encoders(path, data_format, chunk_size)
+        logger.info(f"Словари кодирования построены по {path}")
+
+        on_stage("preprocess")
+        scaler = StandardScaler()
+        classes = set()
+        n_train = n_test = 0
+        for _, X, y, holdout in _stream_features(path, data_format, chunk_size, encoders):
+            if (~holdout).any():
+                scaler.partial_fit(X[~holdout])
+            classes.update(np.unique(y).tolist())
+            n_test += int(holdout.sum())
+            n_train += int((~holdout).sum())
+        if n_train == 0 or len(classes) < 2:
+            raise ValueError("Недостаточно данных для обучения: нужны строки хотя бы двух классов")
+        classes = np.array(sorted(classes))
+        ROWS_PROCESSED.inc("train_streaming", value=n_train + n_test)
+        logger.info(f"Статистики признаков посчитаны: {n_train} строк обучения, {n_test} строк отложенной выборки")
+
+        # alpha = 1 / (C * n) соответствует регуляризации LogisticRegression с параметром C
+        model = SGDClassifier(loss='log_loss', alpha=1.0 / (model_params.C * n_train), random_state=STREAM_SPLIT_SEED)
+        on_stage("fit")
+        for epoch in range(epochs):
+            for index, X, y, holdout in _stream_features(path, data_format, chunk_size, encoders):
+                train = ~holdout
+                if not train.any():
+                    continue
+                order = np.random.default_rng([STREAM_SPLIT_SEED, epoch, index]).permutation(int(train.sum()))
+                model.partial_fit(scaler.transform(X[train])[order], y[train][order], classes=classes)
+            logger.info(f"Эпоха {epoch + 1}/{epochs} потокового обучения завершена")
+
+        # Переносим масштабирование в коэффициенты: модель работает с исходными признаками
+        model.coef_ = model.coef_ / scaler.scale_
+        model.intercept_ = model.intercept_ - model.coef_ @ scaler.mean_
+
+        on_stage("metrics")
+        splits = ("train", "test")
+        confusion = {split: np.zeros((len(classes), len(classes)), dtype=np.int64) for split in splits}
+        scores = {split: ScoreHistogram() for split in splits}
+        for _, X, y, holdout in _stream_features(path, data_format, chunk_size, encoders):
+            actual = np.searchsorted(classes, y)
+            predicted, probabilities = score_model(model, X)
+            for split, mask in (("train", ~holdout), ("test", holdout)):
+                confusion[split] += confusion_counts(actual[mask], predicted[mask], len(classes))
+                if len(classes) == 2:
+                    scores[split].add(actual[mask], probabilities[mask, 1])
+        metrics = {}
+        for split in splits:
+            metrics.update(metrics_from_confusion(confusion[split], split))
+            if len(classes) == 2:
+                metrics.update(scores[split].metrics(split))
+        # Имена признаков задаются после подсчёта метрик по массивам NumPy, как у модели,
+        # обученной на DataFrame
+        model.feature_names_in_ = np.array(REQUIRED_COLUMNS, dtype=object)
+
+        model_name = f"{model.__class__.__name__}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        save_model(model, model_name)
+        save_encoders(encoders, model_name)
+        save_metrics(MetricsModel(metrics=metrics), model_name)
+        logger.info(f"Модель {model_name} обучена потоково и сохранена")
+        return model_name
+    except Exception as e:
+        logger.error(f"Ошибка при потоковом обучении модели: {e}")
+        raise RuntimeError(f"Ошибка при потоковом обучении модели: {e}")
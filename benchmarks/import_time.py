@@ -0,0 +1,130 @@
+"""
+Замер времени холодного импорта приложения (python -X importtime).
+
+Каждый запуск выполняется в новом процессе интерпретатора; в отчёт попадает
+лучший из повторов. Кроме общего времени, отчёт содержит время по пакетам
+верхнего уровня и список тяжёлых пакетов, загруженных при импорте: графика
+и обучение должны импортироваться лениво, при первом использовании.
+
+Пример:
+    python benchmarks/import_time.py --output benchmarks/results/import_time.json
+    python benchmarks/import_time.py --baseline benchmarks/results/import_time.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+
+DEFAULT_MODULE = "backend.main"
+# Пакеты, которые не должны загружаться при импорте приложения
+DEFAULT_FORBIDDEN = ["matplotlib", "seaborn", "sklearn", "scipy", "PIL"]
+
+
+def _parse_importtime(stderr: str) -> list:
+    """
+    Разбирает вывод -X importtime.
+
+    Возвращает список (модуль, собственное время в мкс, накопленное время в мкс)
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        entries.append((module.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure(module: str) -> dict:
+    """
+    Импортирует module в новом процессе и возвращает результаты одного замера.
+    """
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT_DIR, BACKEND_DIR, os.getenv("PYTHONPATH")]))}
+    completed = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Не удалось импортировать {module}: {completed.stderr.strip().splitlines()[-1:]}")
+
+    entries = _parse_importtime(completed.stderr)
+    packages = {}
+    for name, self_us, _ in entries:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    total_us = sum(self_us for _, self_us, _ in entries)
+    return {
+        "seconds": total_us / 1e6,
+        "modules": len(entries),
+        "packages": {
+            package: us / 1e6 for package, us in sorted(packages.items(), key=lambda item: -item[1])
+        },
+        "loaded": sorted(packages),
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """
+    Сравнивает отчёт с базовым.
+
+    threshold: допустимое отношение времени импорта к базовому
+    Возвращает список описаний регрессий
+    """
+    regressions = []
+    ratio = report["seconds"] / baseline["seconds"] if baseline["seconds"] else 1.0
+    if ratio > threshold:
+        regressions.append(f"время импорта x{ratio:.2f}")
+    for package in sorted(set(report["loaded"]) - set(baseline["loaded"])):
+        if report["packages"][package] >= 0.05:
+            regressions.append(f"новый пакет при импорте: {package} ({report['packages'][package]:.3f} с)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени импорта приложения")
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="импортируемый модуль")
+    parser.add_argument("--repeat", type=int, default=5, help="количество запусков")
+    parser.add_argument("--top", type=int, default=15, help="количество пакетов в выводе")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN, help="пакеты, запрещённые при импорте")
+    parser.add_argument("--output", default=None, help="путь к JSON-отчёту")
+    parser.add_argument("--baseline", default=None, help="JSON-отчёт для сравнения")
+    parser.add_argument("--threshold", type=float, default=1.2, help="допустимое замедление относительно базового")
+    args = parser.parse_args()
+
+    runs = [measure(args.module) for _ in range(args.repeat)]
+    best = min(runs, key=lambda run: run["seconds"])
+    report = {
+        "created_at": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "module": args.module,
+        "repeats": [run["seconds"] for run in runs],
+        **best,
+    }
+
+    print(f"{args.module}: {best['seconds']:.3f} с, модулей: {best['modules']}")
+    for package, seconds in list(best["packages"].items())[:args.top]:
+        print(f"{package:>24} {seconds:8.3f} с")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Отчёт сохранён: {args.output}")
+
+    failures = [f"при импорте загружен пакет {package}" for package in args.forbid if package in best["packages"]]
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            failures.extend(compare(report, json.load(f), args.threshold))
+    for failure in failures:
+        print(f"Регрессия: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
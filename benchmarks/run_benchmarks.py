@@ -0,0 +1,292 @@
+"""
+Набор тестов производительности сервиса на синтетических данных.
+
+Каждый замер выполняется в отдельном процессе, поэтому пиковая память (max RSS)
+не смешивается между замерами. Результаты сохраняются в JSON-отчёт; при указании
+--baseline отчёт сравнивается с предыдущим и при регрессии возвращается код 1.
+
+Пример:
+    python benchmarks/run_benchmarks.py --rows 10000 1000000 --benchmarks preprocess predict
+    python benchmarks/run_benchmarks.py --rows 10000 --baseline benchmarks/results/previous.json
+
+Параметры сервиса (LEARNING_CURVE_MODE, PREPROCESSING_MODE и т.д.) задаются
+переменными окружения, как и при обычном запуске.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARKS_DIR)
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+
+DEFAULT_ROWS = [10_000, 1_000_000, 10_000_000]
+# Размер набора данных для обучения модели, используемой в замерах предсказаний
+PREDICT_MODEL_ROWS = 10_000
+MODEL_PARAMS = {"max_iter": 1000, "C": 1.0}
+
+
+def _train_reference_model(seed: int) -> str:
+    from synthetic_data import generate_transactions
+    from services.training_service import train_model
+
+    return train_model(generate_transactions(PREDICT_MODEL_ROWS, seed + 1), SimpleNamespace(**MODEL_PARAMS))
+
+
+def _setup_preprocess(path: str, seed: int):
+    from managers.data_loader import read_data_file
+    from preprocessing import preprocess_data
+
+    df = read_data_file(path)
+    return lambda: preprocess_data(df)
+
+
+def _setup_train(path: str, seed: int):
+    from managers.data_loader import read_data_file
+    from services.training_service import train_model
+
+    df = read_data_file(path)
+    return lambda: train_model(df, SimpleNamespace(**MODEL_PARAMS))
+
+
+def _setup_predict(path: str, seed: int):
+    from managers.data_loader import read_data_file
+    from preprocessing import is_source_column
+    from services.prediction_service import predict
+
+    model_name = _train_reference_model(seed)
+    df = read_data_file(path, usecols=is_source_column)
+    return lambda: predict(model_name, df)
+
+
+def _setup_eda_plots(path: str, seed: int):
+    from services.eda_service import get_plots
+
+    return lambda: get_plots(path)
+
+
+def _setup_eda_summary(path: str, seed: int):
+    from services.eda_service import get_summary
+
+    return lambda: get_summary(path, streaming=False)
+
+
+def _setup_eda_streaming(path: str, seed: int):
+    from services.eda_service import get_summary
+
+    return lambda: get_summary(path, streaming=True)
+
+
+def _client():
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    return TestClient(app)
+
+
+def _post_file(client, url: str, path: str, data: dict):
+    with open(path, "rb") as f:
+        response = client.post(url, files={"file": ("data.csv", f, "text/csv")}, data=data)
+    if response.status_code != 200:
+        raise RuntimeError(f"{url}: HTTP {response.status_code}: {response.text[:200]}")
+    return response
+
+
+def _setup_http_predict(path: str, seed: int):
+    client = _client()
+    model_name = _train_reference_model(seed)
+    return lambda: _post_file(client, "/predict", path, {"model_name": model_name})
+
+
+def _setup_http_train(path: str, seed: int):
+    client = _client()
+    params = {key: str(value) for key, value in MODEL_PARAMS.items()}
+    return lambda: _post_file(client, "/train", path, {**params, "wait": "true"})
+
+
+def _setup_http_eda(path: str, seed: int):
+    client = _client()
+    return lambda: _post_file(client, "/eda", path, {})
+
+
+BENCHMARKS = {
+    "preprocess": _setup_preprocess,
+    "train": _setup_train,
+    "predict": _setup_predict,
+    "eda_plots": _setup_eda_plots,
+    "eda_summary": _setup_eda_summary,
+    "eda_streaming": _setup_eda_streaming,
+    "http_predict": _setup_http_predict,
+    "http_train": _setup_http_train,
+    "http_eda": _setup_http_eda,
+}
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В Linux ru_maxrss измеряется в килобайтах, в macOS - в байтах
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_single(name: str, path: str, seed: int) -> dict:
+    """
+    Выполняет один замер в текущем процессе.
+
+    Подготовка (чтение файла, обучение модели для предсказаний) в замер времени не входит.
+    Возвращает словарь с длительностью и пиковой памятью процесса до и после замера
+    """
+    sys.path[:0] = [BACKEND_DIR, ROOT_DIR, BENCHMARKS_DIR]
+    run = BENCHMARKS[name](path, seed)
+    setup_peak = _peak_rss_bytes()
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "setup_peak_rss_bytes": setup_peak, "peak_rss_bytes": _peak_rss_bytes()}
+
+
+def _dataset(data_dir: str, rows: int, seed: int) -> str:
+    from synthetic_data import write_transactions
+
+    path = os.path.join(data_dir, f"transactions_{rows}_{seed}.csv")
+    if not os.path.exists(path):
+        print(f"Генерация данных: {rows} строк -> {path}", flush=True)
+        write_transactions(path, rows, seed)
+    return path
+
+
+def _run_isolated(name: str, path: str, rows: int, seed: int, timeout: float) -> dict:
+    result = {"benchmark": name, "rows": rows}
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as work_dir:
+        env = {
+            **os.environ,
+            "MODEL_DIR": os.path.join(work_dir, "models"),
+            "FEATURE_CACHE_ENABLED": "false",
+        }
+        command = [sys.executable, "-W", "ignore", __file__, "--single", name, "--data", path, "--seed", str(seed)]
+        try:
+            completed = subprocess.run(
+                command, cwd=work_dir, env=env, capture_output=True, text=True, timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            return {**result, "status": "timeout", "error": f"Превышено время ожидания {timeout} с"}
+
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()[-1:] or [f"код завершения {completed.returncode}"]
+        return {**result, "status": "failed", "error": error[0]}
+    return {**result, "status": "ok", **json.loads(completed.stdout.strip().splitlines()[-1])}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment() -> dict:
+    import numpy
+    import pandas
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": _git_commit(),
+        "packages": {"numpy": numpy.__version__, "pandas": pandas.__version__, "sklearn": sklearn.__version__},
+        "config": {
+            key: value for key, value in os.environ.items()
+            if key.startswith(("PREPROCESSING_", "LEARNING_CURVE_", "MODEL_", "PREDICT_", "EDA_"))
+        },
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list:
+    """
+    Сравнивает отчёт с базовым.
+
+    threshold: допустимое отношение времени и пиковой памяти к базовым значениям
+    Возвращает список описаний регрессий
+    """
+    previous = {(item["benchmark"], item["rows"]): item for item in baseline["results"] if item["status"] == "ok"}
+    regressions = []
+    for item in report["results"]:
+        base = previous.get((item["benchmark"], item["rows"]))
+        if base is None:
+            continue
+        if item["status"] != "ok":
+            regressions.append(f"{item['benchmark']} ({item['rows']}): {item['status']}")
+            continue
+        for key in ("seconds", "peak_rss_bytes"):
+            ratio = item[key] / base[key] if base[key] else 1.0
+            if ratio > threshold:
+                regressions.append(f"{item['benchmark']} ({item['rows']}): {key} x{ratio:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности сервиса")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="размеры наборов данных")
+    parser.add_argument("--benchmarks", nargs="+", choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--seed", type=int, default=0, help="начальное значение генератора данных")
+    parser.add_argument("--repeat", type=int, default=1, help="количество повторов каждого замера")
+    parser.add_argument("--timeout", type=float, default=None, help="ограничение времени одного замера, с")
+    parser.add_argument("--data-dir", default=os.path.join(BENCHMARKS_DIR, "data"))
+    parser.add_argument("--output", default=None, help="путь к JSON-отчёту")
+    parser.add_argument("--baseline", default=None, help="JSON-отчёт для сравнения")
+    parser.add_argument("--threshold", type=float, default=1.2, help="допустимое замедление относительно базового")
+    parser.add_argument("--single", choices=list(BENCHMARKS), help=argparse.SUPPRESS)
+    parser.add_argument("--data", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args.single, args.data, args.seed)))
+        return 0
+
+    sys.path.insert(0, BENCHMARKS_DIR)
+    results = []
+    for rows in args.rows:
+        path = _dataset(args.data_dir, rows, args.seed)
+        for name in args.benchmarks:
+            runs = [_run_isolated(name, path, rows, args.seed, args.timeout) for _ in range(args.repeat)]
+            ok = [run for run in runs if run["status"] == "ok"]
+            result = min(ok, key=lambda run: run["seconds"]) if ok else runs[-1]
+            if ok:
+                result = {**result, "repeats": [run["seconds"] for run in ok]}
+            results.append(result)
+            if result["status"] == "ok":
+                print(f"{name:>14} {rows:>10} {result['seconds']:10.3f} с "
+                      f"{result['peak_rss_bytes'] / 2 ** 20:10.1f} МБ", flush=True)
+            else:
+                print(f"{name:>14} {rows:>10} {result['status']}: {result['error']}", flush=True)
+
+    report = {"created_at": datetime.now().isoformat(), "environment": _environment(), "results": results}
+    output = args.output or os.path.join(
+        BENCHMARKS_DIR, "results", f"report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Отчёт сохранён: {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"Регрессия: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Генератор синтетических транзакций по банковским картам.
+
+Данные имеют ту же схему, что и data/credit_card_transactions.csv, и подходят
+для preprocess_data, обучения и предсказаний. Результат детерминирован для
+заданных количества строк, seed и размера блока.
+
+Пример:
+    python benchmarks/synthetic_data.py --rows 1000000 --output data/synthetic_1m.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    'Unnamed: 0', 'trans_date_trans_time', 'cc_num', 'merchant', 'category', 'amt', 'first', 'last',
+    'gender', 'street', 'city', 'state', 'zip', 'lat', 'long', 'city_pop', 'job', 'dob', 'trans_num',
+    'unix_time', 'merch_lat', 'merch_long', 'is_fraud', 'merch_zipcode'
+]
+
+# Категории и их доли в исходном наборе данных (приблизительно)
+CATEGORIES = {
+    'gas_transport': 0.102, 'grocery_pos': 0.095, 'home': 0.095, 'shopping_pos': 0.090,
+    'kids_pets': 0.087, 'shopping_net': 0.075, 'entertainment': 0.073, 'food_dining': 0.071,
+    'personal_care': 0.070, 'health_fitness': 0.066, 'misc_pos': 0.062, 'misc_net': 0.049,
+    'grocery_net': 0.035, 'travel': 0.030,
+}
+# Категории, в которых мошеннические операции встречаются заметно чаще
+FRAUD_PRONE_CATEGORIES = ['shopping_net', 'grocery_pos', 'misc_net']
+
+STATES = [
+    'AK', 'AL', 'AR', 'AZ', 'CA', 'CO', 'CT', 'DC', 'DE', 'FL', 'GA', 'HI', 'IA', 'ID', 'IL', 'IN', 'KS',
+    'KY', 'LA', 'MA', 'MD', 'ME', 'MI', 'MN', 'MO', 'MS', 'MT', 'NC', 'ND', 'NE', 'NH', 'NJ', 'NM', 'NV',
+    'NY', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VA', 'VT', 'WA', 'WI', 'WV', 'WY'
+]
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'David', 'Susan']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Wilson', 'Moore']
+JOBS = ['Engineer', 'Teacher', 'Nurse', 'Accountant', 'Designer', 'Lawyer', 'Chemist', 'Surveyor', 'Editor']
+
+START = pd.Timestamp('2019-01-01')
+END = pd.Timestamp('2020-12-31 23:59:59')
+# Доля мошеннических операций в исходном наборе данных
+FRAUD_RATE = 0.0058
+# Среднее количество операций на одну карту
+TRANSACTIONS_PER_CARD = 500
+CHUNK_SIZE = 1_000_000
+
+
+def _card_holders(n_cards: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, 0])
+    states = rng.choice(STATES, n_cards)
+    gender = rng.choice(['F', 'M'], n_cards, p=[0.55, 0.45])
+    dob = pd.Timestamp('1925-01-01') + pd.to_timedelta(rng.integers(0, 80 * 365, n_cards), unit='D')
+    return pd.DataFrame({
+        'cc_num': rng.integers(10 ** 11, 10 ** 16, n_cards),
+        'first': rng.choice(FIRST_NAMES, n_cards),
+        'last': rng.choice(LAST_NAMES, n_cards),
+        'gender': gender,
+        'street': [f"{number} Main St" for number in rng.integers(1, 9999, n_cards)],
+        'city': [f"City{number}" for number in rng.integers(0, 900, n_cards)],
+        'state': states,
+        'zip': rng.integers(1000, 99999, n_cards),
+        'lat': rng.uniform(25.0, 49.0, n_cards).round(4),
+        'long': rng.uniform(-124.0, -67.0, n_cards).round(4),
+        'city_pop': np.exp(rng.normal(8.0, 2.0, n_cards)).astype(np.int64) + 20,
+        'job': rng.choice(JOBS, n_cards),
+        'dob': dob.strftime('%Y-%m-%d'),
+    })
+
+
+def _chunk(start_row: int, n_rows: int, total_rows: int, holders: pd.DataFrame, seed: int,
+           chunk_index: int) -> pd.DataFrame:
+    rng = np.random.default_rng([seed, chunk_index + 1])
+    cards = holders.iloc[rng.integers(0, len(holders), n_rows)].reset_index(drop=True)
+
+    # Каждый блок занимает свою часть периода, поэтому время операций возрастает по всему файлу
+    span = int((END - START).total_seconds())
+    low, high = span * start_row // total_rows, span * (start_row + n_rows) // total_rows
+    seconds = np.sort(rng.integers(low, max(high, low + 1), n_rows))
+    trans_time = START + pd.to_timedelta(seconds, unit='s')
+    hour = trans_time.hour.to_numpy()
+
+    weights = np.array(list(CATEGORIES.values()))
+    categories = rng.choice(list(CATEGORIES), n_rows, p=weights / weights.sum())
+    amt = np.round(np.exp(rng.normal(3.6, 1.2, n_rows)), 2)
+
+    # Вероятность мошенничества выше ночью, в отдельных категориях и для крупных сумм
+    night = (hour < 6) | (hour >= 22)
+    weight = 1.0 + 6.0 * night + 3.0 * np.isin(categories, FRAUD_PRONE_CATEGORIES) + 4.0 * (amt > 300)
+    is_fraud = rng.random(n_rows) < FRAUD_RATE * weight / weight.mean()
+    amt = np.where(is_fraud, np.round(rng.uniform(200, 1200, n_rows), 2), amt)
+
+    frame = pd.DataFrame({
+        'Unnamed: 0': np.arange(start_row, start_row + n_rows),
+        'trans_date_trans_time': trans_time.strftime('%Y-%m-%d %H:%M:%S'),
+        'cc_num': cards['cc_num'],
+        'merchant': [f"fraud_Merchant {number}" for number in rng.integers(0, 700, n_rows)],
+        'category': categories,
+        'amt': amt,
+        'first': cards['first'],
+        'last': cards['last'],
+        'gender': cards['gender'],
+        'street': cards['street'],
+        'city': cards['city'],
+        'state': cards['state'],
+        'zip': cards['zip'],
+        'lat': cards['lat'],
+        'long': cards['long'],
+        'city_pop': cards['city_pop'],
+        'job': cards['job'],
+        'dob': cards['dob'],
+        'trans_num': [f"{value:016x}" for value in rng.integers(0, 2 ** 63, n_rows)],
+        'unix_time': trans_time.as_unit('s').asi8,
+        'merch_lat': (cards['lat'] + rng.uniform(-1.0, 1.0, n_rows)).round(6),
+        'merch_long': (cards['long'] + rng.uniform(-1.0, 1.0, n_rows)).round(6),
+        'is_fraud': is_fraud.astype(np.int64),
+        'merch_zipcode': rng.integers(1000, 99999, n_rows).astype(float),
+    })
+    return frame[COLUMNS]
+
+
+def iter_transactions(n_rows: int, seed: int = 0, chunk_size: int = CHUNK_SIZE):
+    """
+    Генерирует синтетические транзакции блоками.
+
+    n_rows: общее количество строк
+    seed: начальное значение генератора случайных чисел
+    chunk_size: количество строк в одном блоке
+    Возвращает итератор DataFrame со столбцами COLUMNS
+    """
+    holders = _card_holders(max(1, n_rows // TRANSACTIONS_PER_CARD), seed)
+    for chunk_index, start_row in enumerate(range(0, n_rows, chunk_size)):
+        yield _chunk(start_row, min(chunk_size, n_rows - start_row), n_rows, holders, seed, chunk_index)
+
+
+def generate_transactions(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Генерирует синтетические транзакции в памяти.
+
+    n_rows: количество строк
+    seed: начальное значение генератора случайных чисел
+    Возвращает DataFrame со столбцами COLUMNS
+    """
+    return pd.concat(iter_transactions(n_rows, seed), ignore_index=True)
+
+
+def write_transactions(path: str, n_rows: int, seed: int = 0, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Записывает синтетические транзакции в CSV блоками, не держа весь набор в памяти.
+
+    path: путь к CSV-файлу
+    n_rows: количество строк
+    seed: начальное значение генератора случайных чисел
+    Возвращает путь к файлу
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        for index, chunk in enumerate(iter_transactions(n_rows, seed, chunk_size)):
+            chunk.to_csv(f, index=False, header=index == 0)
+    os.replace(tmp_path, path)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Генерация синтетических транзакций")
+    parser.add_argument('--rows', type=int, required=True, help="количество строк")
+    parser.add_argument('--seed', type=int, default=0, help="начальное значение генератора")
+    parser.add_argument('--output', required=True, help="путь к CSV-файлу")
+    args = parser.parse_args()
+    write_transactions(args.output, args.rows, args.seed)